@@ -1,6 +1,8 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import keyword
+
 
 class AttrDict(dict):
     """
@@ -22,3 +24,127 @@ class AttrDict(dict):
     def __init__(self, *args, **kwargs):
         super(AttrDict, self).__init__(*args, **kwargs)
         self.__dict__ = self
+
+
+class Record(object):
+    """
+    Compact alternative of AttrDict for large number of records (e.g. parsed rows).
+    Record classes are generated with __slots__ for every set of keys and cached (see get_record_class()),
+    so records don't have per-instance __dict__ and reference cycle like AttrDict.
+    Example:
+        records = to_records([{'id': 1, 'name': 'a'}, {'id': 2, 'name': 'b'}])
+        records[0].name => 'a'
+        records[0]['name'] => 'a'
+
+    Records support attribute and item access, dict(record) and comparison, but keys can't be added or removed.
+    Keys must be valid identifiers that don't start with underscore, like namedtuple fields.
+    Dict methods (keys, values, items, get) are shadowed by keys with the same name, like in AttrDict.
+    """
+    __slots__ = ()
+    _fields = ()
+
+    def __getitem__(self, key):
+        if key not in self._fields:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self._fields:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self._fields
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            return self._fields == other._fields and self._values() == other._values()
+        if isinstance(other, dict):
+            return self._asdict() == other
+        return NotImplemented
+
+    def __repr__(self):
+        return 'Record({})'.format(', '.join('{}={!r}'.format(key, getattr(self, key)) for key in self._fields))
+
+    def __reduce__(self):
+        # generated classes can't be pickled by reference
+        return _make_record, (self._fields, self._values())
+
+    def keys(self):
+        return self._fields
+
+    def values(self):
+        return [getattr(self, key) for key in self._fields]
+
+    def items(self):
+        return [(key, getattr(self, key)) for key in self._fields]
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self._fields else default
+
+    def _values(self):
+        return [getattr(self, key) for key in self._fields]
+
+    def _asdict(self):
+        return {key: getattr(self, key) for key in self._fields}
+
+
+_RECORD_CLASSES = {}
+
+
+def get_record_class(keys):
+    """
+    Returns Record subclass with __slots__ for keys, classes are cached per tuple of keys.
+    """
+    keys = tuple(keys)
+    cls = _RECORD_CLASSES.get(keys)
+    if cls is not None:
+        return cls
+
+    for key in keys:
+        if not isinstance(key, str) or not key.isidentifier() or keyword.iskeyword(key) or key.startswith('_'):
+            raise ValueError('Invalid record key: {!r}'.format(key))
+    if len(set(keys)) != len(keys):
+        raise ValueError('Duplicate record keys: {}'.format(keys))
+
+    # generated __init__ with positional arguments is much faster than setting attributes in loop
+    # (first argument is "_self", because "self" can be one of keys)
+    namespace = {}
+    exec('def __init__(_self, {0}):\n    {1} = {0}\n'.format(', '.join(keys), ', '.join('_self.' + x for x in keys))
+         if keys else 'def __init__(_self):\n    pass\n', namespace)
+    cls = type('Record', (Record,), {'__slots__': keys, '_fields': keys, '__init__': namespace['__init__']})
+    _RECORD_CLASSES[keys] = cls
+    return cls
+
+
+def _make_record(keys, values):
+    return get_record_class(keys)(*values)
+
+
+def to_record(data):
+    """ Converts dict into Record """
+    return get_record_class(data)(*data.values())
+
+
+def to_records(dicts):
+    """ Converts iterable of dicts into list of Records, class is looked up only when keys change """
+    records = []
+    last_keys, cls = None, None
+    for data in dicts:
+        keys = tuple(data)
+        if keys != last_keys:
+            last_keys, cls = keys, get_record_class(keys)
+        records.append(cls(*data.values()))
+    return records
+
+
+def make_records(keys, rows):
+    """ Converts iterable of tuples (e.g. rows of csv.read_csv_batches()) into list of Records with given keys """
+    cls = get_record_class(keys)
+    return [cls(*row) for row in rows]
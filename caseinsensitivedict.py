@@ -1,12 +1,16 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
-# Copied from https://github.com/psf/requests/blob/master/requests/structures.py
+# Based on https://github.com/psf/requests/blob/master/requests/structures.py
 # Apache License 2.0
 
-from collections import OrderedDict
 from collections.abc import Mapping, MutableMapping
 
 
+def fold_key(key):
+    """ Returns case-folded key used for lookups """
+    return key.casefold()
+
+
 class CaseInsensitiveDict(MutableMapping):
     """A case-insensitive ``dict``-like object.
     Implements all methods and operations of
@@ -25,26 +29,36 @@ class CaseInsensitiveDict(MutableMapping):
     value of a ``'Content-Encoding'`` response header, regardless
     of how the header name was originally stored.
     If the constructor, ``.update``, or equality comparison
-    operations are given keys that have equal ``.lower()``s, the
+    operations are given keys that have equal ``.casefold()``s, the
     behavior is undefined.
+    Keys are compared by ``str.casefold()`` (e.g. 'ß' equals 'SS').
+    Keys are folded on every access, looking folded keys up in a cache
+    is slower than folding them again once dicts don't fit in CPU cache.
     """
 
     def __init__(self, data=None, **kwargs):
-        self._store = OrderedDict()
+        self._store = {}  # folded key: (key, value)
         if data is None:
             data = {}
         self.update(data, **kwargs)
 
     def __setitem__(self, key, value):
-        # Use the lowercased key for lookups, but store the actual
+        # Use the folded key for lookups, but store the actual
         # key alongside the value.
-        self._store[key.lower()] = (key, value)
+        self._store[key.casefold()] = (key, value)
 
     def __getitem__(self, key):
-        return self._store[key.lower()][1]
+        return self._store[key.casefold()][1]
 
     def __delitem__(self, key):
-        del self._store[key.lower()]
+        del self._store[key.casefold()]
+
+    def __contains__(self, key):
+        return key.casefold() in self._store
+
+    def get(self, key, default=None):
+        item = self._store.get(key.casefold())
+        return default if item is None else item[1]
 
     def __iter__(self):
         return (casedkey for casedkey, mappedvalue in self._store.values())
@@ -52,8 +66,33 @@ class CaseInsensitiveDict(MutableMapping):
     def __len__(self):
         return len(self._store)
 
+    def update(self, data=(), **kwargs):
+        store = self._store
+        if isinstance(data, CaseInsensitiveDict):
+            store.update(data._store)
+        else:
+            if isinstance(data, Mapping):
+                data = data.items()
+            elif hasattr(data, 'keys'):
+                data = ((key, data[key]) for key in data.keys())
+            for key, value in data:
+                store[key.casefold()] = (key, value)
+        for key, value in kwargs.items():
+            store[key.casefold()] = (key, value)
+
+    def update_folded(self, items):
+        """
+        Bulk update from (folded key, (key, value)) pairs, e.g. folded_items() of other CaseInsensitiveDict.
+        Folded key must be equal to fold_key(key), it's not checked.
+        """
+        self._store.update(items)
+
+    def folded_items(self):
+        """(folded key, (key, value)) pairs, see update_folded()."""
+        return self._store.items()
+
     def lower_items(self):
-        """Like iteritems(), but with all lowercase keys."""
+        """Like iteritems(), but with all folded (lowercase) keys."""
         return (
             (lowerkey, keyval[1])
             for (lowerkey, keyval)
@@ -61,16 +100,61 @@ class CaseInsensitiveDict(MutableMapping):
         )
 
     def __eq__(self, other):
-        if isinstance(other, Mapping):
-            other = CaseInsensitiveDict(other)
+        if isinstance(other, CaseInsensitiveDict):
+            other_items = other.lower_items()
+        elif isinstance(other, Mapping):
+            other_items = ((key.casefold(), value) for key, value in other.items())
         else:
             return NotImplemented
-        # Compare insensitively
-        return dict(self.lower_items()) == dict(other.lower_items())
+        # Compare insensitively without building new dict
+        if len(self._store) != len(other):
+            return False
+        store = self._store
+        for lowerkey, value in other_items:
+            item = store.get(lowerkey)
+            if item is None or item[1] != value:
+                return False
+        return True
 
     # Copy is required
     def copy(self):
-        return CaseInsensitiveDict(self._store.values())
+        new = CaseInsensitiveDict()
+        new._store = self._store.copy()
+        return new
 
     def __repr__(self):
         return str(dict(self.items()))
+
+
+if __name__ == '__main__':
+    # micro-benchmark, compares with original implementation from requests library (if installed)
+    import timeit
+    try:
+        from requests.structures import CaseInsensitiveDict as OriginalCaseInsensitiveDict
+    except ImportError:
+        OriginalCaseInsensitiveDict = None
+
+    classes = [CaseInsensitiveDict] + ([OriginalCaseInsensitiveDict] if OriginalCaseInsensitiveDict else [])
+
+    for size in [1000, 10000, 100000]:
+        keys = [f'Data/Textures/Characters/Player_{i:06d}/Diffuse' for i in range(size)]
+        lookup_keys = [x.upper() for x in keys]
+        missing_keys = [x + '_Missing' for x in lookup_keys]
+
+        for cls in classes:
+            cid = cls((x, i) for i, x in enumerate(keys))
+            other = cls(cid)
+            cases = {
+                'build': lambda: cls((x, i) for i, x in enumerate(keys)),
+                'getitem': lambda: [cid[x] for x in lookup_keys],
+                'getitem same case': lambda: [cid[x] for x in keys],
+                'get missing': lambda: [cid.get(x) for x in missing_keys],
+                'contains': lambda: [x in cid for x in lookup_keys],
+                'contains missing': lambda: [x in cid for x in missing_keys],
+                'eq': lambda: cid == other,
+                'copy': lambda: cid.copy(),
+            }
+            print(f'{cls.__module__}.{cls.__name__} ({size} keys)')
+            for name, func in cases.items():
+                seconds = min(timeit.repeat(func, number=5, repeat=5)) / 5
+                print(f'    {name: <20}{seconds * 1000: >10.3f} ms')
@@ -6,32 +6,256 @@
 # how to import:
 # from configmanager import CONFIG_MANAGER
 
+import os
 import configparser
+import collections
+import threading
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+def parse_boolean(value):
+    if value.lower() not in configparser.ConfigParser.BOOLEAN_STATES:
+        raise ValueError("Not a boolean: %s" % value)
+    return configparser.ConfigParser.BOOLEAN_STATES[value.lower()]
+
+
+def parse_int(value):
+    value = value.strip()
+    if value.startswith("0x"):
+        return int(value, 16)
+    return int(value)
+
+
+def parse_list(value):
+    str_list = [x.strip() for x in value.strip().split(",")]
+    if len(str_list) == 1 and str_list[0] == "":
+        str_list = []
+    return str_list
 
 
 class ConfigManager(object):
+    """
+    Typed snapshot
+    --------------
+    Schema declares types of options, whole config is then parsed and validated at once into immutable
+    snapshot with attribute access. Snapshot is rebuilt only after load_config() or clear_config().
+    >>> CONFIG_MANAGER.set_schema({
+    >>>     "Network": {"timeout": "float", "hosts": "list", "retries": ("int", 3)},
+    >>> })
+    >>> CONFIG_MANAGER.get_snapshot().Network.timeout
+
+    Types are keys of VALUE_PARSERS or any callable that gets string value.
+    Option with (type, default) tuple is optional, default is used as is (not parsed).
+    List types are parsed into tuples.
+
+    Hot reload
+    ----------
+    Config is never modified in place, all loaded files are parsed again into new object and then swapped,
+    so readers on other threads never block and never see partially loaded config.
+    >>> CONFIG_MANAGER.load_config("config.ini")
+    >>> CONFIG_MANAGER.watch(interval=1.0)  # reloads config.ini when it changes
+    """
+
+    VALUE_PARSERS = {
+        "str": lambda value: value,
+        "str_lower": lambda value: value.lower(),
+        "boolean": parse_boolean,
+        "int": parse_int,
+        "float": float,
+        "list": lambda value: tuple(parse_list(value)),
+        "list_lower": lambda value: tuple(parse_list(value.lower())),
+        "list_int": lambda value: tuple(int(x) for x in parse_list(value)),
+        "list_float": lambda value: tuple(float(x) for x in parse_list(value)),
+    }
 
     def __init__(self):
         self.config = None
+        self.schema = None
+        self.snapshot = None
+        self.loaded_paths = []  # config is parsed from these files in this order, reloaded by watch thread
+        self.lock = threading.Lock()  # serializes loading, readers use it only to store built snapshot
+        self.watch_thread = None
+        self.watch_stop = None
         self.clear_config()
 
     @classmethod
     def get_object(cls):
         return cls()
 
-    def clear_config(self):
-        self.config = configparser.ConfigParser(interpolation=None, inline_comment_prefixes=('#',))
+    @staticmethod
+    def _new_config():
+        config = configparser.ConfigParser(interpolation=None, inline_comment_prefixes=('#',))
         # make case sensitive
-        self.config.optionxform = lambda option: option
+        config.optionxform = lambda option: option
+        return config
+
+    @classmethod
+    def _read_config(cls, paths):
+        # files are always parsed together into one parser, so that values in [DEFAULT] of later files
+        # override the same options in earlier files, as they would in config.read()
+        config = cls._new_config()
+        config.read(paths, encoding="utf-8")
+        return config
+
+    def clear_config(self):
+        with self.lock:
+            self.config = self._new_config()
+            self.snapshot = None
+            self.loaded_paths = []
 
     def load_config(self, path, update=True):
-        if not update:
-            self.clear_config()
+        """
+        path : str or list
+            Path or list of paths of config files, missing files are ignored
+            (they are still watched and loaded by reload_config() when they appear)
+        update : bool
+            If True, loaded values update current config, otherwise current config is replaced
+        """
+        with self.lock:
+            paths = list(self.loaded_paths) if update else []
+            paths.extend([path] if isinstance(path, (str, bytes, os.PathLike)) else path)
+            try:
+                config = self._read_config(paths)
+            except Exception:
+                logger.exception("Couldn't load config file '%s'!" % path)
+                return
+            self.config = config
+            self.snapshot = None
+            self.loaded_paths = paths
+
+    def reload_config(self):
+        """
+        Parses all loaded config files again into new config, validates it by schema (if set)
+        and swaps it with current config. On failure old config is kept. Missing files are ignored, as in load_config().
+
+        returns : True if config was reloaded
+        """
+        with self.lock:
+            paths = list(self.loaded_paths)
+            try:
+                config = self._read_config(paths)
+                snapshot = self.build_snapshot(config) if self.schema is not None else None
+            except Exception:
+                logger.exception("Couldn't reload config files %s!" % paths)
+                return False
+            self.config = config
+            self.snapshot = snapshot
+        logger.info("Reloaded config files %s" % paths)
+        return True
+
+    # watching files
+
+    def watch(self, interval=1.0, on_reload=None):
+        """
+        Starts daemon thread that polls loaded config files and reloads config when they change (see reload_config()).
+        File is reloaded only after it stayed unchanged for one interval, so partially written files are not loaded.
+
+        interval : float
+            Seconds between checks of files
+        on_reload : callable
+            Called with new snapshot (None if schema is not set) after successful reload
+        """
+        self.stop_watching()
+        self.watch_stop = threading.Event()
+        self.watch_thread = threading.Thread(
+            target=self._watch, args=(self._get_files_state(), interval, on_reload, self.watch_stop),
+            name="ConfigManagerWatch", daemon=True
+        )
+        self.watch_thread.start()
+
+    def stop_watching(self):
+        if self.watch_thread is not None:
+            self.watch_stop.set()
+            self.watch_thread.join()
+            self.watch_thread = None
+
+    def _get_files_state(self):
+        paths = list(self.loaded_paths)
+        state = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+                state.append((stat.st_mtime_ns, stat.st_size, stat.st_ino))
+            except OSError:
+                state.append(None)
+        return paths, state
+
+    def _watch(self, loaded_state, interval, on_reload, stop):
+        last_state = loaded_state
+        while not stop.wait(interval):
+            state = self._get_files_state()
+            if state != last_state:  # files are changing, wait until they are stable
+                last_state = state
+                continue
+            if state[0] != loaded_state[0]:  # paths changed by load_config()
+                loaded_state = state
+                continue
+            if state == loaded_state:
+                continue
+            loaded_state = state  # invalid config is not retried until files change again
+            if self.reload_config() and on_reload is not None:
+                try:
+                    on_reload(self.snapshot)
+                except Exception:
+                    logger.exception("Config reload callback failed!")
+
+    # typed snapshot
+
+    def set_schema(self, schema):
+        """
+        schema : dict
+            {section: {option: type or (type, default)}}, see class docstring
+        """
+        with self.lock:
+            self.schema = schema
+            self.snapshot = None
+
+    def get_snapshot(self):
+        """ Returns immutable snapshot of config parsed by schema, it's cached until config changes """
+        config, schema = self.config, self.schema
+        snapshot = self.snapshot
+        if snapshot is None:
+            snapshot = self.build_snapshot(config)
+            with self.lock:
+                # don't cache snapshot of config (or schema) replaced while it was built
+                if self.config is config and self.schema is schema:
+                    self.snapshot = snapshot
+        return snapshot
+
+    def build_snapshot(self, config):
+        """ Parses and validates config by schema, raises exception with all invalid options """
+        if self.schema is None:
+            raise Exception("Config schema is not set!")
+        sections = {}
+        errors = []
+        for section, options in self.schema.items():
+            values = {}
+            for option, option_type in options.items():
+                optional = isinstance(option_type, tuple)
+                option_type, default = option_type if optional else (option_type, None)
+                parser = self.VALUE_PARSERS[option_type] if isinstance(option_type, str) else option_type
+                if not config.has_option(section, option):
+                    if not optional:
+                        errors.append("[%s] %s: missing" % (section, option))
+                    values[option] = default
+                    continue
+                try:
+                    values[option] = parser(config.get(section, option))
+                except Exception as e:
+                    errors.append("[%s] %s: %s" % (section, option, e))
+            sections[section] = self._get_snapshot_class(section, tuple(values))(**values)
+        if errors:
+            raise Exception("Invalid config! %s" % "; ".join(errors))
+        return self._get_snapshot_class("ConfigSnapshot", tuple(sections))(**sections)
 
+    @staticmethod
+    def _get_snapshot_class(name, fields):
         try:
-            self.config.read(path, encoding="utf-8")
-        except Exception:
-            print("Couldn't load config file '%s'!" % path)
+            return collections.namedtuple(name, fields)
+        except ValueError:
+            raise Exception("Config sections and options in schema must be valid identifiers: %s %s" % (name, fields))
 
     def get(self, section, option, lowercase=False):
         val = self.config.get(section, option)
@@ -45,20 +269,13 @@ class ConfigManager(object):
         return self.config.getboolean(section, option)
 
     def get_int(self, section, option):
-        str_num = self.get(section, option).strip()
-        if str_num.startswith("0x"):
-            return int(str_num, 16)
-        else:
-            return self.config.getint(section, option)
+        return parse_int(self.get(section, option))
 
     def get_float(self, section, option):
         return self.config.getfloat(section, option)
 
     def get_list(self, section, option, lowercase=False):
-        str_list = [x.strip() for x in self.get(section, option, lowercase=lowercase).strip().split(",")]
-        if len(str_list) == 1 and str_list[0] == "":
-            str_list = []
-        return str_list
+        return parse_list(self.get(section, option, lowercase=lowercase))
 
     def get_list_int(self, section, option):
         return [int(x) for x in self.get_list(section, option)]
@@ -2,31 +2,251 @@
 # -*- coding: utf-8 -*-
 
 import csv
+import os
+import io
+import bz2
+import gzip
+import lzma
+import itertools
+import collections
+from concurrent.futures import ProcessPoolExecutor
 
 import logging
 logger = logging.getLogger(__name__)
 
+COMPRESSED_OPENERS = {
+    '.gz': gzip.open,
+    '.bz2': bz2.open,
+    '.xz': lzma.open,
+}
+BATCH_SIZE = 10000
+PARALLEL_CHUNK_SIZE = 64 * 1024**2  # bytes of file parsed by one task of read_csv_parallel()
+
+
+def open_csv(filepath, mode='r'):
+    """
+    Opens csv file in text mode, files with extension .gz, .bz2 or .xz are (de)compressed.
+    """
+    opener = COMPRESSED_OPENERS.get(os.path.splitext(str(filepath))[1].lower())
+    if opener is not None:
+        return opener(filepath, mode + 't', newline='')
+    return open(filepath, mode, newline='')
+
 
 def read_csv(filepath):
-    with open(filepath, "r") as f:
-        csvdicts = read_csv_stream(f)
-    return csvdicts
+    """ Generator of rows as dicts, file stays open until generator is exhausted or closed """
+    with open_csv(filepath) as f:
+        yield from read_csv_stream(f)
 
 
 def read_csv_stream(stream):
     return csv.DictReader(stream)
 
 
-def write_csv(filepath, csvdicts):
-    """ csvdicts => list(dict(), dict(), ...)"""
-    # get headers
-    headers = []
-    for key in csvdicts[0]:
-        headers.append(key)
+def read_csv_headers(source, **fmtparams):
+    """ Returns list of headers (first row) of csv file or stream """
+    if isinstance(source, (str, os.PathLike)):
+        with open_csv(source) as f:
+            return next(csv.reader(f, **fmtparams), [])
+    return next(csv.reader(source, **fmtparams), [])
+
+
+def parse_bool(value):
+    """ Converter for schema, accepts true/false, yes/no, 1/0 (case insensitive) """
+    value = value.strip().lower()
+    if value in ('true', 'yes', '1'):
+        return True
+    if value in ('false', 'no', '0'):
+        return False
+    raise ValueError(f'Invalid boolean value "{value}"')
+
+
+def read_csv_batches(source, batch_size=BATCH_SIZE, schema=None, columns=False, headers=None, **fmtparams):
+    """
+    Generator of batches of rows, much cheaper than dict per row.
+    File stays open until generator is exhausted or closed.
+
+    source : str or stream
+        Path to csv file (can be compressed, see open_csv()) or opened text stream
+    batch_size : int
+        Max number of rows in one batch
+    schema : dict
+        {header: converter}, converter is callable that gets string, e.g. int, float, parse_bool.
+        Empty strings are converted to None. Values of columns not in schema stay strings.
+    columns : bool
+        If False, batch is list of tuples (rows). If True, batch is {header: list of values} (columns).
+    headers : list
+        Headers of file without header row. If None, first row is used as headers.
+    fmtparams
+        Parameters of csv.reader (delimiter, quotechar, ...)
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open_csv(source) as f:
+            yield from read_csv_batches(f, batch_size, schema, columns, headers, **fmtparams)
+        return
+
+    reader = csv.reader(source, **fmtparams)
+    if headers is None:
+        headers = next(reader, None)
+        if headers is None:
+            return
+    converters = [(schema or {}).get(x) for x in headers]
+    while True:
+        rows = list(itertools.islice(reader, batch_size))
+        if not rows:
+            break
+        yield _convert_rows(rows, headers, converters, columns)
+
+
+def _convert_rows(rows, headers, converters, columns):
+    """ Converts list of parsed csv rows (lists of strings) into batch, see read_csv_batches() """
+    length = len(headers)
+    if any(len(x) != length for x in rows):
+        # pad missing values with empty strings, drop extra values
+        rows = [(x + [''] * length)[:length] for x in rows]
+    # convert column by column, much faster than value by value
+    column_values = []
+    for values, converter in zip(zip(*rows), converters):
+        if converter is None:
+            column_values.append(values)
+        else:
+            column_values.append([None if x == '' else converter(x) for x in values])
+    if columns:
+        return {header: list(values) for header, values in zip(headers, column_values)}
+    return list(zip(*column_values))
+
+
+def read_csv_parallel(filepath, workers=None, batch_size=BATCH_SIZE, schema=None, columns=False, merge=False,
+                      chunk_size=PARALLEL_CHUNK_SIZE, encoding='utf-8', **fmtparams):
+    """
+    Parses csv file in worker processes. File is split into byte ranges of about chunk_size bytes
+    aligned on line ends, so quoted values must not contain newlines. Compressed files are not supported.
+    Parameters are the same as in read_csv_batches(), converters in schema must be picklable (not lambdas).
+
+    workers : int
+        Number of worker processes, default is number of CPUs
+    merge : bool
+        If True, returns {header: list of all values} instead of generator of batches
+
+    returns : generator of batches in order of file (see read_csv_batches()) or merged columns
+    """
+    with open(filepath, 'rb') as f:
+        headers = next(csv.reader([f.readline().decode(encoding)], **fmtparams), [])
+        ranges = _split_ranges(f, f.tell(), os.fstat(f.fileno()).st_size, chunk_size)
+
+    columns = columns or merge
+    results = _map_ordered(_read_csv_range, ranges, workers or os.cpu_count(),
+                           filepath, headers, batch_size, schema, columns, encoding, fmtparams)
+    batches = (batch for range_batches in results for batch in range_batches)
+    if not merge:
+        return batches
+
+    merged = {header: [] for header in headers}
+    for batch in batches:
+        for header in headers:
+            merged[header].extend(batch[header])
+    return merged
+
+
+def _split_ranges(f, start, end, chunk_size):
+    """ Returns list of (start, end) byte ranges of binary file, every range ends after end of line """
+    ranges = []
+    while start < end:
+        f.seek(min(start + chunk_size, end))
+        f.readline()  # move to start of next line
+        ranges.append((start, min(f.tell(), end)))
+        start = f.tell()
+    return ranges
+
+
+def _read_csv_range(byte_range, filepath, headers, batch_size, schema, columns, encoding, fmtparams):
+    start, end = byte_range
+    with open(filepath, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    stream = io.StringIO(data.decode(encoding), newline='')
+    return list(read_csv_batches(stream, batch_size, schema, columns, headers, **fmtparams))
+
+
+def write_csv(filepath, csvdicts, headers=None, extrasaction='raise', **kwargs):
+    """
+    csvdicts => iterable of dicts, e.g. list(dict(), dict(), ...) or generator
+    headers => list of keys, default are keys of first dict. Missing keys are written as empty values.
+    extrasaction => 'raise' raises ValueError for keys not in headers, 'ignore' skips them (as in csv.DictWriter)
+    kwargs => parameters of write_csv_rows()
+    """
+    if extrasaction not in ('raise', 'ignore'):
+        raise ValueError(f'extrasaction ({extrasaction}) must be \'raise\' or \'ignore\'')
+    csvdicts = iter(csvdicts)
+    if headers is None:
+        first = next(csvdicts, None)
+        headers = list(first) if first is not None else []
+        csvdicts = itertools.chain([first] if first is not None else [], csvdicts)
+    write_csv_rows(filepath, _dicts_to_rows(csvdicts, headers, extrasaction == 'raise'), headers, **kwargs)
+
+
+def _dicts_to_rows(dicts, headers, check_keys):
+    headers_set = set(headers)
+    for row in dicts:
+        if check_keys and not headers_set.issuperset(row):
+            extra = ', '.join(repr(x) for x in row if x not in headers_set)
+            raise ValueError(f'dict contains fields not in fieldnames: {extra}')
+        yield tuple(row.get(key, '') for key in headers)
+
+
+def write_csv_rows(filepath, rows, headers=None, workers=0, batch_size=BATCH_SIZE, **fmtparams):
+    """
+    Writes rows from any iterable (e.g. generator), so rows don't have to fit in memory.
+    Rows are formatted in batches of batch_size rows, every batch is written as one block.
+
+    filepath : str
+        Path to csv file, files with extension .gz, .bz2 or .xz are compressed
+    rows : iterable
+        Tuples or lists of values in order of headers
+    headers : list
+        Written as first row, if set
+    workers : int
+        If > 1, batches are formatted in parallel by worker processes and written in original order
+    fmtparams
+        Parameters of csv.writer (delimiter, quotechar, ...)
+    """
+    with open_csv(filepath, 'w') as f:
+        if headers:
+            f.write(_format_rows([headers], fmtparams))
+        batches = _iter_batches(rows, batch_size)
+        if workers and workers > 1:
+            for text in _map_ordered(_format_rows, batches, workers, fmtparams):
+                f.write(text)
+        else:
+            for batch in batches:
+                f.write(_format_rows(batch, fmtparams))
+
+
+def _iter_batches(iterable, batch_size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, batch_size))
+        if not batch:
+            break
+        yield batch
+
+
+def _format_rows(rows, fmtparams):
+    buffer = io.StringIO()
+    csv.writer(buffer, **fmtparams).writerows(rows)
+    return buffer.getvalue()
+
 
-    # write to csv
-    with open(filepath, 'w') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=headers)
-        writer.writeheader()
-        for row in csvdicts:
-            writer.writerow(row)
+def _map_ordered(func, iterable, workers, *args):
+    """
+    Generator of func(item, *args) results in order of items, computed by worker processes.
+    Unlike ProcessPoolExecutor.map() it consumes iterable lazily, only 2 tasks per worker are pending at once.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = collections.deque()
+        for item in iterable:
+            pending.append(executor.submit(func, item, *args))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
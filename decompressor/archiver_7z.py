@@ -5,18 +5,28 @@ import os
 import tempfile
 import shutil
 import subprocess
+import datetime
 import logging
 
-from .archiver_interface import ArchiverInterface
+from .archiver_interface import ArchiverInterface, ArchiveFileStat
 
 logger = logging.getLogger(__name__)
 
 
 class External7zLib(object):
 
-    def __init__(self, archive_path):
-        self.work_dir = tempfile.mkdtemp()
-        self.archive_path = os.path.abspath(archive_path)
+    def __init__(self, archive):
+        self.temp_dir = tempfile.mkdtemp()
+        self.work_dir = os.path.join(self.temp_dir, 'files')
+        self.file_stats = None
+
+        # external tool can only read files, so streams are copied into temp dir
+        if isinstance(archive, str):
+            self.archive_path = os.path.abspath(archive)
+        else:
+            self.archive_path = os.path.join(self.temp_dir, 'archive.7z')
+            with open(self.archive_path, 'wb') as f:
+                shutil.copyfileobj(archive, f)
 
         # try to open 7z file
         p = subprocess.Popen(
@@ -37,7 +47,40 @@ class External7zLib(object):
             raise Exception(f'Failed to open 7z file "{self.archive_path}" with external tool:\n{out}')
 
     def close(self):
-        shutil.rmtree(self.work_dir)
+        shutil.rmtree(self.temp_dir)
+
+    def get_file_stats(self):
+        """ Returns {path: ArchiveFileStat}, parsed from technical listing of external tool """
+        if self.file_stats is not None:
+            return self.file_stats
+
+        p = subprocess.Popen(
+            ['7z', 'l', '-slt', f'{self.archive_path}'],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True
+        )
+        out, err = p.communicate()
+
+        # file blocks start after '----------' line and are separated by empty lines
+        self.file_stats = {}
+        listing = out.split('\n----------\n', 1)[-1]
+        for block in listing.split('\n\n'):
+            values = {}
+            for line in block.strip().split('\n'):
+                key, sep, value = line.partition(' = ')
+                if sep:
+                    values[key.strip()] = value.strip()
+            if 'Path' not in values or values.get('Folder') == '+' or 'D' in values.get('Attributes', ''):
+                continue
+            mtime = None
+            if values.get('Modified'):
+                mtime = datetime.datetime.strptime(values['Modified'][:19], '%Y-%m-%d %H:%M:%S').timestamp()
+            self.file_stats[os.path.normpath(values['Path'])] = ArchiveFileStat(
+                size=int(values['Size']) if values.get('Size') else None,
+                compressed_size=int(values['Packed Size']) if values.get('Packed Size') else None,
+                mtime=mtime,
+                crc=int(values['CRC'], 16) if values.get('CRC') else None,
+            )
+        return self.file_stats
 
     def get_file_list(self):
         path_list = []
@@ -53,28 +96,41 @@ class External7zLib(object):
             data = f.read()
         return data
 
+    def open_file_stream(self, path):
+        return open(os.path.join(self.work_dir, path), 'rb')
+
 
 class Archiver7z(ArchiverInterface):
 
     EXTENSIONS = {'7z', 'cb7'}
+    SIGNATURES = {(0, b"7z\xbc\xaf'\x1c")}
+    PARALLEL_EXTRACT = False  # every handle unpacks whole archive into temporary directory
 
-    def open(self, archive_path):
+    def open(self, archive):
         self.close()
-        self.opened_archive = External7zLib(archive_path)
+        self.opened_archive = External7zLib(archive)
+        self.archive_source = archive
 
     def close(self):
         if self.archive_opened():
             self.opened_archive.close()
         self.opened_archive = None
+        self.archive_source = None
 
     def get_file_list(self):
         # doesnt list directories
         return self.opened_archive.get_file_list()
 
+    def stat(self, file_path):
+        return self.opened_archive.get_file_stats()[os.path.normpath(file_path)]
+
     def open_file(self, file_path):
         """ Returns Bytes """
         return self.opened_archive.open_file(file_path)
 
+    def open_file_stream(self, file_path):
+        return self.opened_archive.open_file_stream(file_path)
+
     def extract_file(self, file_path, extract_path):
         with open(extract_path, 'wb') as f:
             f.write(self.open_file(file_path))
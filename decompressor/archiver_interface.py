@@ -1,6 +1,66 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import io
+from collections import namedtuple
+from typing import BinaryIO, Union
+
+# size and compressed_size in bytes, mtime as unix timestamp, crc as CRC-32 integer. Unknown values are None.
+ArchiveFileStat = namedtuple('ArchiveFileStat', 'size compressed_size mtime crc')
+
+
+class ArchiveMemberSlice(io.RawIOBase):
+    """
+    Read-only seekable view of part of archive file. Used for random access to files stored uncompressed in archive.
+    Position of underlying file object is set before every read, so it can be shared with archive reader.
+    """
+
+    def __init__(self, fileobj: BinaryIO, offset: int, size: int, close_fileobj: bool = False):
+        super().__init__()
+        self.fileobj = fileobj
+        self.offset = offset
+        self.size = size
+        self.close_fileobj = close_fileobj
+        self.position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self.position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f'Invalid whence value: {whence}')
+        if position < 0:
+            raise ValueError(f'Negative seek position {position}')
+        self.position = position
+        return self.position
+
+    def readinto(self, buffer) -> int:
+        length = min(len(buffer), self.size - self.position)
+        if length <= 0:
+            return 0
+        self.fileobj.seek(self.offset + self.position)
+        data = self.fileobj.read(length)
+        buffer[:len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+    def close(self) -> None:
+        if not self.closed and self.close_fileobj:
+            self.fileobj.close()
+        super().close()
+
 
 class ArchiverInterface(object):
     """
@@ -8,18 +68,35 @@ class ArchiverInterface(object):
     """
 
     EXTENSIONS = set()
+    # file signatures (magic bytes) used to detect archive type, {(offset, magic_bytes), ...}
+    SIGNATURES = set()
+    # False if every opened handle is expensive (e.g. unpacks whole archive), so it shouldn't be opened per process
+    PARALLEL_EXTRACT = True
 
-    def __init__(self, archive_path: str):
+    def __init__(self, archive: Union[str, BinaryIO, None]):
         self.opened_archive = None
-        if archive_path:
-            self.open(archive_path)
+        self.archive_source = None  # path or file-like object archive was opened from
+        if archive:
+            self.open(archive)
+
+    @classmethod
+    def check_signature(cls, archive: Union[str, BinaryIO]) -> bool:
+        """
+        Called when one of SIGNATURES matches, checks that archive really is of this type.
+        Stream position is preserved.
+        """
+        return True
 
     def archive_opened(self) -> bool:
         """ Checks if there is any opened archive """
         return self.opened_archive is not None
 
-    def open(self, archive_path: str) -> None:
-        """ Opens archive """
+    def can_extract_parallel(self) -> bool:
+        """ Checks if opened archive can be processed by worker processes, each with its own handle """
+        return self.PARALLEL_EXTRACT
+
+    def open(self, archive: Union[str, BinaryIO]) -> None:
+        """ Opens archive from path or seekable file-like object """
         raise NotImplementedError
 
     def close(self) -> None:
@@ -30,10 +107,31 @@ class ArchiverInterface(object):
         """ Returns list of files in archive """
         raise NotImplementedError
 
+    def stat(self, file_path: str) -> ArchiveFileStat:
+        """ Returns metadata of file in archive """
+        raise NotImplementedError
+
     def open_file(self, file_path: str) -> bytes:
         """ Returns stream """
         raise NotImplementedError
 
+    def open_file_stream(self, file_path: str) -> BinaryIO:
+        """ Returns readable file-like object. Default implementation buffers whole file in memory. """
+        return io.BytesIO(self.open_file(file_path))
+
+    def open_file_seekable(self, file_path: str) -> BinaryIO:
+        """
+        Returns seekable file-like object with cheap random access (used for opening nested archives).
+        Default implementation buffers whole file in memory.
+        """
+        return io.BytesIO(self.open_file(file_path))
+
+    def _open_member_slice(self, offset: int, size: int) -> ArchiveMemberSlice:
+        """ Returns view of part of archive file. Archives opened from path get new file handle. """
+        if isinstance(self.archive_source, str):
+            return ArchiveMemberSlice(open(self.archive_source, 'rb'), offset, size, close_fileobj=True)
+        return ArchiveMemberSlice(self.archive_source, offset, size)
+
     def extract_file(self, file_path: str, extract_path: str) -> None:
         """ Extracts file to path """
         raise NotImplementedError
@@ -2,9 +2,10 @@
 # -*- coding: utf-8 -*-
 
 import rarfile
+import time
 import logging
 
-from .archiver_interface import ArchiverInterface
+from .archiver_interface import ArchiverInterface, ArchiveFileStat
 
 logger = logging.getLogger(__name__)
 
@@ -12,15 +13,18 @@ logger = logging.getLogger(__name__)
 class ArchiverRar(ArchiverInterface):
 
     EXTENSIONS = {'rar', 'cbr'}
+    SIGNATURES = {(0, b'Rar!\x1a\x07')}  # both RAR4 and RAR5
 
-    def open(self, archive_path):
+    def open(self, archive):
         self.close()
-        self.opened_archive = rarfile.RarFile(archive_path)
+        self.opened_archive = rarfile.RarFile(archive)
+        self.archive_source = archive
 
     def close(self):
         if self.archive_opened():
             self.opened_archive.close()
         self.opened_archive = None
+        self.archive_source = None
 
     def get_file_list(self):
         filtered_paths = []  # filter out directories
@@ -32,8 +36,20 @@ class ArchiverRar(ArchiverInterface):
             filtered_paths.append(fp)
         return filtered_paths
 
+    def stat(self, file_path):
+        info = self.opened_archive.getinfo(file_path)
+        return ArchiveFileStat(
+            size=info.file_size,
+            compressed_size=info.compress_size,
+            mtime=time.mktime(tuple(info.date_time) + (0, 0, -1)),
+            crc=info.CRC,
+        )
+
     def open_file(self, file_path):
         return self.opened_archive.open(file_path).read()
 
+    def open_file_stream(self, file_path):
+        return self.opened_archive.open(file_path)
+
     def extract_file(self, file_path, extract_path):
         self.opened_archive.extract(file_path, extract_path)
@@ -1,26 +1,62 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import io
 import tarfile
+import gzip
+import bz2
+import lzma
 import logging
 
-from .archiver_interface import ArchiverInterface
+from .archiver_interface import ArchiverInterface, ArchiveFileStat
 
 logger = logging.getLogger(__name__)
 
 
-class ArchiverTar(ArchiverInterface):  # TODO: create support for tar.gz
+class ArchiverTar(ArchiverInterface):
 
-    EXTENSIONS = {'tar', 'cbt'}
+    EXTENSIONS = {'tar', 'cbt', 'tgz', 'tbz', 'tbz2', 'txz'}
+    SIGNATURES = {
+        (257, b'ustar'),  # POSIX tar
+        (0, b'\x1f\x8b'),  # gzip
+        (0, b'BZh'),  # bzip2
+        (0, b'\xfd7zXZ\x00'),  # xz
+    }
 
-    def open(self, archive_path):
+    @classmethod
+    def check_signature(cls, archive):
+        # compression signatures match any compressed file, it must contain tar header
+        if isinstance(archive, str):
+            return cls._read_first_member(archive, None)
+        last_pos = archive.tell()
+        try:
+            return cls._read_first_member(None, archive)
+        finally:
+            archive.seek(last_pos, io.SEEK_SET)
+
+    @staticmethod
+    def _read_first_member(path, fileobj):
+        try:
+            with tarfile.open(path, 'r', fileobj=fileobj) as tf:
+                tf.next()
+        except (tarfile.TarError, OSError, EOFError):
+            return False
+        return True
+
+    def open(self, archive):
         self.close()
-        self.opened_archive = tarfile.open(archive_path, 'r')
+        # detects compression
+        if isinstance(archive, str):
+            self.opened_archive = tarfile.open(archive, 'r')
+        else:
+            self.opened_archive = tarfile.open(fileobj=archive, mode='r')
+        self.archive_source = archive
 
     def close(self):
         if self.archive_opened():
             self.opened_archive.close()
         self.opened_archive = None
+        self.archive_source = None
 
     def get_file_list(self):
         filtered_paths = []  # filter out directories
@@ -29,10 +65,37 @@ class ArchiverTar(ArchiverInterface):  # TODO: create support for tar.gz
                 filtered_paths.append(member.name)
         return filtered_paths
 
+    def stat(self, file_path):
+        # tar has only header checksums, files are compressed together with whole archive (if at all)
+        member = self.opened_archive.getmember(file_path)
+        return ArchiveFileStat(
+            size=member.size,
+            compressed_size=None if self._is_compressed() else member.size,
+            mtime=float(member.mtime),
+            crc=None,
+        )
+
+    def can_extract_parallel(self):
+        # every handle of compressed archive would decompress whole stream to find members
+        return not self._is_compressed()
+
+    def _is_compressed(self):
+        return isinstance(self.opened_archive.fileobj, (gzip.GzipFile, bz2.BZ2File, lzma.LZMAFile))
+
     def open_file(self, file_path):
         member = self.opened_archive.getmember(file_path)
         return self.opened_archive.extractfile(member).read()
 
+    def open_file_stream(self, file_path):
+        member = self.opened_archive.getmember(file_path)
+        return self.opened_archive.extractfile(member)
+
+    def open_file_seekable(self, file_path):
+        member = self.opened_archive.getmember(file_path)
+        if self._is_compressed() or member.issparse():
+            return super().open_file_seekable(file_path)
+        return self._open_member_slice(member.offset_data, member.size)
+
     def extract_file(self, file_path, extract_path):
         member = self.opened_archive.getmember(file_path)
         self.opened_archive.extract(member, extract_path)
@@ -2,25 +2,33 @@
 # -*- coding: utf-8 -*-
 
 import zipfile
+import struct
+import time
 import logging
 
-from .archiver_interface import ArchiverInterface
+from .archiver_interface import ArchiverInterface, ArchiveFileStat
 
 logger = logging.getLogger(__name__)
 
+LOCAL_FILE_HEADER = struct.Struct('<4s2B4HL2L2H')
+LOCAL_FILE_HEADER_SIGNATURE = b'PK\x03\x04'
+
 
 class ArchiverZip(ArchiverInterface):
 
     EXTENSIONS = {'zip', 'cbz'}
+    SIGNATURES = {(0, b'PK\x03\x04'), (0, b'PK\x05\x06'), (0, b'PK\x07\x08')}
 
-    def open(self, archive_path):
+    def open(self, archive):
         self.close()
-        self.opened_archive = zipfile.ZipFile(archive_path)
+        self.opened_archive = zipfile.ZipFile(archive)
+        self.archive_source = archive
 
     def close(self):
         if self.archive_opened():
             self.opened_archive.close()
         self.opened_archive = None
+        self.archive_source = None
 
     def get_file_list(self):
         filtered_paths = []  # filter out directories
@@ -30,8 +38,34 @@ class ArchiverZip(ArchiverInterface):
             filtered_paths.append(fp)
         return filtered_paths
 
+    def stat(self, file_path):
+        info = self.opened_archive.getinfo(file_path)
+        return ArchiveFileStat(
+            size=info.file_size,
+            compressed_size=info.compress_size,
+            mtime=time.mktime(info.date_time + (0, 0, -1)),
+            crc=info.CRC,
+        )
+
     def open_file(self, file_path):
         return self.opened_archive.open(file_path).read()
 
+    def open_file_stream(self, file_path):
+        return self.opened_archive.open(file_path)
+
+    def open_file_seekable(self, file_path):
+        info = self.opened_archive.getinfo(file_path)
+        if info.compress_type != zipfile.ZIP_STORED or info.flag_bits & 0x1:  # compressed or encrypted
+            return super().open_file_seekable(file_path)
+
+        # file data starts after local file header, which can have different extra field than central directory
+        stream = self._open_member_slice(info.header_offset, info.compress_size + LOCAL_FILE_HEADER.size)
+        header = LOCAL_FILE_HEADER.unpack(stream.read(LOCAL_FILE_HEADER.size))
+        stream.close()
+        if header[0] != LOCAL_FILE_HEADER_SIGNATURE:
+            raise zipfile.BadZipFile(f'Bad local file header of "{file_path}"')
+        data_offset = info.header_offset + LOCAL_FILE_HEADER.size + header[10] + header[11]
+        return self._open_member_slice(data_offset, info.compress_size)
+
     def extract_file(self, file_path, extract_path):
         self.opened_archive.extract(file_path, extract_path)
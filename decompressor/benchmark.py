@@ -0,0 +1,296 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Decompression throughput benchmark for archivers and StorageArchive.
+
+Generates reproducible synthetic archives locally and measures for every archive format:
+    open_s          time to open archive
+    list_s          time to list files in archive
+    random_ms       mean latency of reading random file (and p95_ms)
+    seq_mb_s        throughput of reading all files sequentially
+    peak_rss_mb     peak resident memory of process that ran the case
+
+Every case runs in its own fresh process, so peak RSS isn't affected by other cases.
+Formats that need external tools (7z, rar) are skipped if the tool is not installed.
+
+Usage (from parent directory of package):
+    python -m <package>.decompressor.benchmark --scale 0.1 --json results.json
+"""
+
+import os
+import io
+import json
+import time
+import random
+import shutil
+import tarfile
+import zipfile
+import tempfile
+import resource
+import subprocess
+import statistics
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from .decompressor import Decompressor
+
+logger = logging.getLogger(__name__)
+
+# name: (number of files, file size in bytes, directory depth)
+LAYOUTS = {
+    'small_files': (5000, 4 * 1024, 3),
+    'huge_files': (4, 64 * 1024**2, 0),
+    'mixed_nested': (500, 256 * 1024, 5),
+}
+FORMATS = ['zip_stored', 'zip_deflated', 'tar', 'tar_gz', '7z', 'rar']
+CHUNK_SIZE = 64 * 1024
+READ_BUFFER_SIZE = 1024 * 1024
+
+
+def generate_files(src_dir: str, count: int, size: int, depth: int, seed: int) -> None:
+    """ Writes reproducible files, mix of incompressible and text-like compressible chunks """
+    rnd = random.Random(seed)
+    words = [bytes(rnd.choice(b'abcdefghijklmnopqrstuvwxyz') for _ in range(rnd.randint(2, 10))) for _ in range(512)]
+    chunks = []
+    for i in range(32):
+        if i % 2:
+            chunks.append(rnd.randbytes(CHUNK_SIZE))
+        else:
+            chunks.append(b' '.join(rnd.choice(words) for _ in range(CHUNK_SIZE // 4))[:CHUNK_SIZE])
+
+    for i in range(count):
+        dir_path = os.path.join(src_dir, *[f'dir_{(i // (3 ** level)) % 3}' for level in range(depth)])
+        os.makedirs(dir_path, exist_ok=True)
+        with open(os.path.join(dir_path, f'file_{i:06d}.bin'), 'wb') as f:
+            remaining = size
+            while remaining > 0:
+                chunk = chunks[rnd.randrange(len(chunks))][:remaining]
+                f.write(chunk)
+                remaining -= len(chunk)
+
+
+def create_archive(archive_format: str, src_dir: str, archive_base: str) -> str:
+    """ Creates archive from files in src_dir. Returns path to archive or None if format is not available. """
+    file_paths = []
+    for dir_name, subdir_list, file_list in os.walk(src_dir):
+        for file_name in sorted(file_list):
+            file_paths.append(os.path.relpath(os.path.join(dir_name, file_name), src_dir))
+    file_paths.sort()
+
+    if archive_format in ['zip_stored', 'zip_deflated']:
+        path = f'{archive_base}_{archive_format}.zip'
+        compression = zipfile.ZIP_STORED if archive_format == 'zip_stored' else zipfile.ZIP_DEFLATED
+        with zipfile.ZipFile(path, 'w', compression=compression) as zf:
+            for file_path in file_paths:
+                zf.write(os.path.join(src_dir, file_path), arcname=file_path)
+
+    elif archive_format in ['tar', 'tar_gz']:
+        path = f'{archive_base}.tar' if archive_format == 'tar' else f'{archive_base}.tar.gz'
+        with tarfile.open(path, 'w' if archive_format == 'tar' else 'w:gz') as tf:
+            for file_path in file_paths:
+                tf.add(os.path.join(src_dir, file_path), arcname=file_path)
+
+    elif archive_format in ['7z', 'rar']:
+        path = f'{archive_base}.{archive_format}'
+        tool = '7z' if archive_format == '7z' else 'rar'
+        if shutil.which(tool) is None:
+            return None
+        cmd = [tool, 'a', '-r', path, '.'] if tool == '7z' else [tool, 'a', '-r', '-idq', path, '.']
+        subprocess.run(cmd, cwd=src_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+
+    else:
+        raise Exception(f'Unknown archive format "{archive_format}"')
+
+    return path
+
+
+def _peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+
+def run_archiver_case(archive_path: str, random_reads: int, seed: int) -> dict:
+    """ Measures one archive with Decompressor. Should be run in fresh process. """
+    result = {'baseline_rss_mb': _peak_rss_mb()}
+
+    start_time = time.perf_counter()
+    dec = Decompressor(archive_path)
+    result['open_s'] = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    file_list = dec.get_file_list()
+    result['list_s'] = time.perf_counter() - start_time
+    result['files'] = len(file_list)
+
+    # random access latency
+    rnd = random.Random(seed)
+    latencies = []
+    for file_path in (rnd.choice(file_list) for _ in range(random_reads)):
+        start_time = time.perf_counter()
+        dec.open_file(file_path).read(1)
+        latencies.append(time.perf_counter() - start_time)
+    result['random_ms'] = statistics.mean(latencies) * 1000
+    result['p95_ms'] = sorted(latencies)[int(len(latencies) * 0.95)] * 1000
+
+    # sequential read throughput
+    buffer = bytearray(READ_BUFFER_SIZE)
+    total_bytes = 0
+    start_time = time.perf_counter()
+    for file_path in file_list:
+        with dec.opened_archive.open_file_stream(file_path) as stream:
+            while True:
+                length = stream.readinto(buffer)
+                if not length:
+                    break
+                total_bytes += length
+    seconds = time.perf_counter() - start_time
+    result['seq_mb_s'] = total_bytes / 1024**2 / seconds if seconds > 0 else 0.0
+    result['bytes'] = total_bytes
+
+    dec.close()
+    result['peak_rss_mb'] = _peak_rss_mb()
+    return result
+
+
+def run_storage_case(archive_path: str, random_reads: int, seed: int) -> dict:
+    """ Measures one archive with StorageArchive. Should be run in fresh process. """
+    from ..vfs.storage_archive import StorageArchive
+    result = {'baseline_rss_mb': _peak_rss_mb()}
+
+    start_time = time.perf_counter()
+    storage = StorageArchive(f'file://{os.path.abspath(archive_path)}')
+    result['list_s'] = time.perf_counter() - start_time
+    result['files'] = len(storage.index)
+
+    rnd = random.Random(seed)
+    paths = sorted(storage.index)
+    latencies = []
+    for path in (rnd.choice(paths) for _ in range(random_reads)):
+        start_time = time.perf_counter()
+        storage.get(path)
+        latencies.append(time.perf_counter() - start_time)
+    result['random_ms'] = statistics.mean(latencies) * 1000
+    result['p95_ms'] = sorted(latencies)[int(len(latencies) * 0.95)] * 1000
+
+    storage.close_archives()
+    result['peak_rss_mb'] = _peak_rss_mb()
+    return result
+
+
+def run_in_fresh_process(func, *args) -> dict:
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+        return executor.submit(func, *args).result()
+
+
+def run_benchmark(work_dir: str, layouts: list, formats: list, scale: float = 1.0, random_reads: int = 200,
+                  seed: int = 0, storage: bool = True) -> list:
+    """ Returns list of result dicts, one for each (layout, format, reader) case """
+    results = []
+    for layout in layouts:
+        count, size, depth = LAYOUTS[layout]
+        if count > 10:
+            count = max(1, int(count * scale))
+        else:
+            size = max(1, int(size * scale))
+
+        name = f'{layout}_{count}x{size}_seed{seed}'
+        src_dir = os.path.join(work_dir, name)
+        if not os.path.exists(src_dir):
+            logger.info(f'Generating {count} files of {size} bytes for layout "{layout}"')
+            generate_files(src_dir, count, size, depth, seed)
+
+        for archive_format in formats:
+            archive_path = create_archive(archive_format, src_dir, os.path.join(work_dir, name))
+            if archive_path is None:
+                logger.warning(f'Skipping format "{archive_format}", external tool not installed')
+                continue
+            archive_size = os.path.getsize(archive_path)
+
+            cases = [('decompressor', run_archiver_case)]
+            if storage:
+                cases.append(('storage_archive', run_storage_case))
+            for reader, func in cases:
+                logger.info(f'Running {layout}/{archive_format}/{reader}')
+                result = run_in_fresh_process(func, archive_path, random_reads, seed)
+                result.update(layout=layout, format=archive_format, reader=reader, archive_bytes=archive_size)
+                results.append(result)
+    return results
+
+
+def format_results(results: list) -> str:
+    columns = ['layout', 'format', 'reader', 'files', 'archive_bytes', 'open_s', 'list_s', 'random_ms', 'p95_ms',
+               'seq_mb_s', 'peak_rss_mb']
+    lines = [' '.join(f'{x: >15}' for x in columns)]
+    for result in results:
+        values = []
+        for column in columns:
+            value = result.get(column, '')
+            values.append(f'{value: >15.3f}' if isinstance(value, float) else f'{value: >15}')
+        lines.append(' '.join(values))
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    # Parsing input parameters
+    parser = argparse.ArgumentParser(
+        description='decompressor benchmark'
+    )
+    parser.add_argument(
+        '--layouts', nargs='+', choices=sorted(LAYOUTS), default=sorted(LAYOUTS),
+        help='Archive layouts to benchmark'
+    )
+    parser.add_argument(
+        '--formats', nargs='+', choices=FORMATS, default=FORMATS,
+        help='Archive formats to benchmark'
+    )
+    parser.add_argument(
+        '--scale', type=float, default=1.0,
+        help='Multiplier of number of files (or file size for layouts with few files)'
+    )
+    parser.add_argument(
+        '--random-reads', type=int, default=200,
+        help='Number of random file reads used for measuring latency'
+    )
+    parser.add_argument(
+        '--seed', type=int, default=0,
+        help='Seed of generated data and random reads'
+    )
+    parser.add_argument(
+        '--no-storage', action='store_true',
+        help='Do not benchmark StorageArchive'
+    )
+    parser.add_argument(
+        '--work-dir', default=None,
+        help='Directory for generated files and archives, kept after benchmark. Default is temporary directory.'
+    )
+    parser.add_argument(
+        '--json', default=None,
+        help='Save results as JSON to this path'
+    )
+    parser.add_argument(
+        '-d', '--debug', type=int, choices=[50, 40, 30, 20, 10, 1], default=None,
+        help='Set global debug level [CRITICAL=50, ERROR=40, WARNING=30, INFO=20, DEBUG=10, SPAM=1]. '
+             'Default level is INFO.'
+    )
+    args = parser.parse_args()
+
+    # Logger configuration
+    logging.basicConfig()
+    logger = logging.getLogger()
+    logger.setLevel(args.debug if args.debug is not None else 20)
+
+    # run benchmark
+    work_dir = args.work_dir or tempfile.mkdtemp()
+    try:
+        results = run_benchmark(work_dir, args.layouts, args.formats, scale=args.scale,
+                                random_reads=args.random_reads, seed=args.seed, storage=not args.no_storage)
+    finally:
+        if args.work_dir is None:
+            shutil.rmtree(work_dir)
+
+    print(format_results(results))
+    if args.json:
+        with io.open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
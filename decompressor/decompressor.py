@@ -4,20 +4,56 @@
 import logging
 import os
 import io
-from typing import Union
+import shutil
+import time
+import zlib
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from typing import Union, Iterable, Iterator, List, BinaryIO, Callable
 
-from .archiver_interface import ArchiverInterface
+from .archiver_interface import ArchiverInterface, ArchiveFileStat
 
 logger = logging.getLogger(__name__)
 
+EXTRACT_BUFFER_SIZE = 1024 * 1024
+VERIFY_BUFFER_SIZE = 1024 * 1024
+
+# archive handle of worker process, opened by _init_worker()
+_worker_decompressor = None
+
+
+def _init_worker(archive_path: str, archiver: type) -> None:
+    global _worker_decompressor
+    _worker_decompressor = Decompressor()
+    _worker_decompressor._open_with_archiver(archiver, archive_path)
+
+
+def _worker_extract_files(file_paths: List[str], dest: str) -> int:
+    return _worker_decompressor._extract_files(file_paths, dest)
+
+
+def _worker_verify_files(file_paths: List[str]) -> dict:
+    return _worker_decompressor._verify_files(file_paths)
+
+
+def _split_list(items: list, parts: int) -> List[list]:
+    """ Splits list into continuous chunks, so workers read archive mostly sequentially """
+    chunk_size = max(1, -(-len(items) // parts))
+    return [items[i:i+chunk_size] for i in range(0, len(items), chunk_size)]
+
 
 class Decompressor(object):
 
     ARCHIVERS = set()
     EXTENSIONS = set()
+    ARCHIVERS_BY_EXTENSION = {}
+    SIGNATURES = []  # [(offset, magic_bytes, archiver), ...] sorted by offset
+    SIGNATURE_READ_SIZE = 512
 
     def __init__(self, path: Union[str, None] = None, extension: Union[str, None] = None):
         self.opened_archive = None
+        self.archive_path = None
+        self.owned_stream = None  # stream of nested archive, closed together with archive
         if path:
             self.open(path, extension=extension)
 
@@ -26,36 +62,119 @@ class Decompressor(object):
         assert issubclass(archiver, ArchiverInterface)
         cls.ARCHIVERS.add(archiver)
         cls.EXTENSIONS |= archiver.EXTENSIONS
-        logger.info(f'Added archiver {archiver.__class__.__name__} supporting file types: {archiver.EXTENSIONS}')
+        for extension in archiver.EXTENSIONS:
+            cls.ARCHIVERS_BY_EXTENSION[extension.lower()] = archiver
+        cls.SIGNATURES = sorted(
+            cls.SIGNATURES + [(offset, magic, archiver) for offset, magic in archiver.SIGNATURES],
+            key=lambda x: x[0]
+        )
+        logger.info(f'Added archiver {archiver.__name__} supporting file types: {archiver.EXTENSIONS}')
+
+    @classmethod
+    def get_archiver_by_extension(cls, extension: Union[str, None]) -> Union[type, None]:
+        """ Returns archiver class supporting file extension or None """
+        if not extension:
+            return None
+        return cls.ARCHIVERS_BY_EXTENSION.get(extension.lower())
+
+    @classmethod
+    def detect_archiver(cls, archive: Union[str, BinaryIO]) -> Union[type, None]:
+        """ Returns archiver class detected from file signature (magic bytes) or None """
+        if isinstance(archive, str):
+            with open(archive, 'rb') as f:
+                header = f.read(cls.SIGNATURE_READ_SIZE)
+        else:
+            last_pos = archive.tell()
+            header = archive.read(cls.SIGNATURE_READ_SIZE)
+            archive.seek(last_pos, io.SEEK_SET)
+        for offset, magic, archiver in cls.SIGNATURES:
+            if header.startswith(magic, offset) and archiver.check_signature(archive):
+                return archiver
+        return None
+
+    @classmethod
+    def is_supported(cls, archive_path: str, extension: Union[str, None] = None) -> bool:
+        """ Checks if archive is supported. Uses extension if known, otherwise file content. """
+        if extension is None:
+            extension = os.path.splitext(archive_path)[1].replace('.', '')
+        if cls.get_archiver_by_extension(extension) is not None:
+            return True
+        try:
+            return cls.detect_archiver(archive_path) is not None
+        except OSError:
+            return False
 
     def archive_opened(self) -> bool:
         """ Checks if there is any opened archive """
         return self.opened_archive is not None
 
-    def open(self, archive_path: str, extension: Union[str, None] = None) -> None:
-        """ Opens archive """
+    def open(self, archive_path: Union[str, BinaryIO], extension: Union[str, None] = None) -> None:
+        """ Opens archive from path or seekable file-like object """
         # close any opened archives
         self.close()
 
         # get extension
-        if extension is None:
+        if extension is None and isinstance(archive_path, str):
             filename, extension = os.path.splitext(archive_path)
             extension = extension.replace('.', '')
 
-        # get supported archiver and open archive with it
-        for archiver in self.ARCHIVERS:
-            if extension in archiver.EXTENSIONS:
-                self.opened_archive = archiver(archive_path)
+        # get archiver supporting extension, fallback to detecting archive type from file content
+        archiver = self.get_archiver_by_extension(extension)
+        if archiver is None:
+            archiver = self.detect_archiver(archive_path)
+            if archiver is None:
+                raise Exception(f'Archive extension "{extension}" not supported and archive type not detected!')
+            self._open_with_archiver(archiver, archive_path)
+            return
+
+        try:
+            self._open_with_archiver(archiver, archive_path)
+        except Exception:
+            # extension might be wrong, try archiver detected from file content
+            detected_archiver = self.detect_archiver(archive_path)
+            if detected_archiver is None or detected_archiver is archiver:
+                raise
+            logger.warning(f'Archive "{archive_path}" is not {archiver.__name__} archive, '
+                           f'opening as {detected_archiver.__name__}')
+            self._open_with_archiver(detected_archiver, archive_path)
 
-        # check if found archiver that supports extension
-        if self.opened_archive is None:
-            raise Exception(f'Archive extension "{extension}" not supported!')
+    def _open_with_archiver(self, archiver: type, archive_path: Union[str, BinaryIO]) -> None:
+        if not isinstance(archive_path, str):
+            archive_path.seek(0, io.SEEK_SET)  # rewind stream after failed attempt
+        self.opened_archive = archiver(archive_path)
+        self.archive_path = archive_path if isinstance(archive_path, str) else None
+
+    def open_nested(self, file_path: str, extension: Union[str, None] = None) -> 'Decompressor':
+        """
+        Opens archive that is stored inside of opened archive.
+        Files stored without compression are read directly from outer archive, others are buffered in memory.
+        Returned Decompressor must be closed before this one.
+        """
+        if not self.archive_opened():
+            raise Exception('No archive opened!')
+        if extension is None:
+            filename, extension = os.path.splitext(file_path)
+            extension = extension.replace('.', '')
+
+        stream = self.opened_archive.open_file_seekable(file_path)
+        nested = Decompressor()
+        try:
+            nested.open(stream, extension=extension)
+        except Exception:
+            stream.close()
+            raise
+        nested.owned_stream = stream
+        return nested
 
     def close(self) -> None:
         """ close any opened archives """
         if self.archive_opened():
             self.opened_archive.close()
+        if self.owned_stream is not None:
+            self.owned_stream.close()
         self.opened_archive = None
+        self.archive_path = None
+        self.owned_stream = None
 
     def get_file_list(self) -> list:
         """ Returns list of files in archive """
@@ -69,12 +188,128 @@ class Decompressor(object):
             raise Exception('No archive opened!')
         return io.BytesIO(self.opened_archive.open_file(file_path))
 
+    def stat(self, file_path: str) -> ArchiveFileStat:
+        """ Returns size, compressed size, modification time and CRC-32 of file. Unknown values are None. """
+        if not self.archive_opened():
+            raise Exception('No archive opened!')
+        return self.opened_archive.stat(file_path)
+
     def extract_file(self, file_path: str, extract_path: str) -> None:
         """ Extracts file to path """
         if not self.archive_opened():
             raise Exception('No archive opened!')
         self.opened_archive.extract_file(file_path, extract_path)
 
+    def extract_all(self, dest: str, members: Union[Iterable[str], None] = None,
+                    workers: Union[int, None] = None) -> dict:
+        """
+        Extracts files into dest directory, preserving directory structure inside archive.
+        Files are split between worker processes, each with its own archive handle.
+
+        :param dest: path to destination directory
+        :param members: paths of files to extract, default is all files in archive
+        :param workers: number of worker processes, default is number of CPUs
+        :return: dict(files=, bytes=, seconds=, mb_per_s=)
+        """
+        if not self.archive_opened():
+            raise Exception('No archive opened!')
+        members = self.get_file_list() if members is None else list(members)
+
+        start_time = time.perf_counter()
+        total_bytes = sum(self._map_parallel(_worker_extract_files, self._extract_files, members, workers, dest))
+        seconds = time.perf_counter() - start_time
+
+        stats = {
+            'files': len(members),
+            'bytes': total_bytes,
+            'seconds': seconds,
+            'mb_per_s': (total_bytes / 1024**2 / seconds) if seconds > 0 else 0.0,
+        }
+        logger.info(f'Extracted {stats["files"]} files ({stats["bytes"]} bytes) '
+                    f'in {stats["seconds"]:.2f}s ({stats["mb_per_s"]:.1f} MB/s)')
+        return stats
+
+    def verify(self, members: Union[Iterable[str], None] = None, workers: Union[int, None] = None) -> dict:
+        """
+        Checks integrity of files by streaming them through CRC-32 and comparing with CRC and size stored
+        in archive. Formats without per-file CRC (tar, 7z without CRC) are only checked to be fully readable.
+        Files are split between worker processes, each with its own archive handle.
+
+        :param members: paths of files to verify, default is all files in archive
+        :param workers: number of worker processes, default is number of CPUs
+        :return: dict {file_path: error message} of files that failed verification
+        """
+        if not self.archive_opened():
+            raise Exception('No archive opened!')
+        members = self.get_file_list() if members is None else list(members)
+
+        errors = {}
+        for chunk_errors in self._map_parallel(_worker_verify_files, self._verify_files, members, workers):
+            errors.update(chunk_errors)
+        for file_path, error in errors.items():
+            logger.warning(f'Verification of "{file_path}" failed: {error}')
+        return errors
+
+    def _map_parallel(self, worker_func: Callable, local_func: Callable, members: List[str],
+                      workers: Union[int, None], *args) -> Iterator:
+        """
+        Splits members into chunks and processes them with worker_func in worker processes,
+        or with local_func in this process if parallel processing is not possible.
+        """
+        workers = max(1, min(workers or os.cpu_count() or 1, len(members)))
+        # archives opened from stream can't be reopened by workers
+        if workers == 1 or self.archive_path is None or not self.opened_archive.can_extract_parallel():
+            yield local_func(members, *args)
+            return
+
+        # more chunks than workers, so that slow chunks don't block whole processing
+        chunks = _split_list(members, workers * 4)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(self.archive_path, type(self.opened_archive))) as executor:
+            yield from executor.map(worker_func, chunks, *[itertools.repeat(x) for x in args])
+
+    def _extract_files(self, file_paths: Iterable[str], dest: str) -> int:
+        """ Extracts files into dest directory. Returns number of written bytes. """
+        dest = os.path.abspath(dest)
+        total_bytes = 0
+        for file_path in file_paths:
+            # don't allow writing outside of dest directory
+            extract_path = os.path.abspath(os.path.join(dest, file_path.replace('\\', '/')))
+            if os.path.commonpath([dest, extract_path]) != dest:
+                raise Exception(f'Archive file path "{file_path}" points outside of destination directory!')
+
+            os.makedirs(os.path.dirname(extract_path), exist_ok=True)
+            with self.opened_archive.open_file_stream(file_path) as src, \
+                    open(extract_path, 'wb', buffering=EXTRACT_BUFFER_SIZE) as dst:
+                shutil.copyfileobj(src, dst, EXTRACT_BUFFER_SIZE)
+                total_bytes += dst.tell()
+        return total_bytes
+
+    def _verify_files(self, file_paths: Iterable[str]) -> dict:
+        """ Verifies CRC and size of files. Returns {file_path: error message} of invalid files. """
+        errors = {}
+        buffer = bytearray(VERIFY_BUFFER_SIZE)
+        view = memoryview(buffer)
+        for file_path in file_paths:
+            try:
+                stat = self.opened_archive.stat(file_path)
+                crc, size = 0, 0
+                with self.opened_archive.open_file_stream(file_path) as stream:
+                    while True:
+                        length = stream.readinto(view)
+                        if not length:
+                            break
+                        crc = zlib.crc32(view[:length], crc)
+                        size += length
+            except Exception as e:
+                errors[file_path] = f'{e.__class__.__name__}: {e}'
+                continue
+            if stat.size is not None and size != stat.size:
+                errors[file_path] = f'Size mismatch: read {size} bytes, expected {stat.size} bytes'
+            elif stat.crc is not None and crc != stat.crc:
+                errors[file_path] = f'CRC mismatch: computed {crc:08x}, expected {stat.crc:08x}'
+        return errors
+
 
 # Add default archivers
 
@@ -114,6 +349,18 @@ if __name__ == '__main__':
         '-l', '--list', action='store_true',
         help='List files in archive'
     )
+    parser.add_argument(
+        '-x', '--extract', metavar='DEST', default=None,
+        help='Extract all files in archive into DEST directory'
+    )
+    parser.add_argument(
+        '-v', '--verify', action='store_true',
+        help='Verify integrity of files in archive'
+    )
+    parser.add_argument(
+        '-w', '--workers', type=int, default=None,
+        help='Number of worker processes used for extraction and verification. Default is number of CPUs.'
+    )
     parser.add_argument(
         '-d', '--debug', type=int, choices=[50, 40, 30, 20, 10, 1], default=None,
         help='Set global debug level [CRITICAL=50, ERROR=40, WARNING=30, INFO=20, DEBUG=10, SPAM=1]. '
@@ -132,8 +379,18 @@ if __name__ == '__main__':
     # process archive
     dec = Decompressor()
     dec.open(args.path)
-    file_list = dec.get_file_list()
-    for file_path in file_list:
-        print(file_path)
-    print(f'first_file: {dec.open_file(file_list[0])}')
+    if args.extract:
+        stats = dec.extract_all(args.extract, workers=args.workers)
+        print(f'Extracted {stats["files"]} files ({stats["bytes"]} bytes) in {stats["seconds"]:.2f}s '
+              f'({stats["mb_per_s"]:.1f} MB/s)')
+    elif args.verify:
+        errors = dec.verify(workers=args.workers)
+        for file_path, error in sorted(errors.items()):
+            print(f'{file_path}: {error}')
+        print('Archive is OK' if not errors else f'{len(errors)} files failed verification')
+    else:
+        file_list = dec.get_file_list()
+        for file_path in file_list:
+            print(file_path)
+        print(f'first_file: {dec.open_file(file_list[0])}')
     dec.close()
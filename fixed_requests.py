@@ -1,8 +1,26 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import os
 import time
+import bisect
+import pickle
+import hashlib
+import tempfile
+import email.utils
+import http.cookiejar
+import asyncio
+import threading
+import collections
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 import requests
+import requests.adapters
+import urllib3
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
 
 import logging
 logger = logging.getLogger(__name__)
@@ -10,11 +28,450 @@ logger = logging.getLogger(__name__)
 logging.getLogger("requests").setLevel(logging.WARNING)
 logging.getLogger("urllib3").setLevel(logging.WARNING)
 
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class HostState(object):
+    """ Rate limiting state of one host """
+    __slots__ = ['tokens', 'updated', 'blocked_until', 'delay', 'error_rate']
+
+    def __init__(self, tokens, now):
+        self.tokens = tokens  # tokens in bucket at time `updated`
+        self.updated = now
+        self.blocked_until = 0.0  # backoff
+        self.delay = 0.0  # adaptive delay
+        self.error_rate = 0.0  # exponential moving average of throttled responses
+
+
+class HostRateLimiter(object):
+    """
+    Token bucket rate limiter with separate bucket for every host.
+    reserve() doesn't sleep, it only returns how long the caller must wait before sending request,
+    so that it can be used from threads and from asyncio.
+
+    With adaptive throttling, delay of host is widened on throttled responses (429/503) proportionally to observed
+    error rate, and shrunk linearly on successful ones (AIMD), but never below `delay`.
+    """
+
+    ADAPTIVE_MIN_DELAY = 0.5  # delay used after first error, if there was none before
+    ADAPTIVE_DECREASE_STEP = 0.1
+    ERROR_RATE_WEIGHT = 0.2
+
+    def __init__(self, delay=0, burst=1, adaptive=False, max_delay=60):
+        self.delay = delay  # min average time between requests to one host
+        self.burst = burst  # max number of requests that can be sent to one host without delay
+        self.adaptive = adaptive
+        self.max_delay = max_delay  # max adaptive delay
+        self.hosts = {}  # {host: HostState}
+        self.lock = threading.Lock()
+
+    def set_delay(self, delay):
+        self.delay = delay
+
+    def _get_state(self, host, now):
+        if host not in self.hosts:
+            self.hosts[host] = HostState(float(self.burst), now)
+        return self.hosts[host]
+
+    def get_delay(self, host):
+        """ Returns current delay between requests to host """
+        state = self.hosts.get(host)
+        return max(self.delay, state.delay if (state and self.adaptive) else 0.0)
+
+    def reserve(self, host):
+        """ Takes token from bucket of host and returns time in seconds that must be waited before using it """
+        with self.lock:
+            now = time.monotonic()
+            state = self._get_state(host, now)
+            delay = self.get_delay(host)
+            wait = max(0.0, state.blocked_until - now)
+            if delay > 0:
+                state.tokens = min(float(self.burst), state.tokens + (now - state.updated) / delay) - 1
+                if state.tokens < 0:
+                    wait = max(wait, -state.tokens * delay)
+            state.updated = now
+            return wait
+
+    def penalize(self, host, seconds):
+        """ Blocks all requests to host for given number of seconds (backoff) """
+        with self.lock:
+            now = time.monotonic()
+            state = self._get_state(host, now)
+            state.blocked_until = max(state.blocked_until, now + seconds)
+
+    def record_success(self, host):
+        """ Additive decrease of adaptive delay """
+        with self.lock:
+            state = self._get_state(host, time.monotonic())
+            state.error_rate *= 1 - self.ERROR_RATE_WEIGHT
+            state.delay = max(0.0, state.delay - self.ADAPTIVE_DECREASE_STEP)
+
+    def record_error(self, host):
+        """ Multiplicative increase of adaptive delay, by factor between 1 and 2 depending on error rate """
+        with self.lock:
+            state = self._get_state(host, time.monotonic())
+            state.error_rate = state.error_rate * (1 - self.ERROR_RATE_WEIGHT) + self.ERROR_RATE_WEIGHT
+            state.delay = min(self.max_delay, max(state.delay, self.ADAPTIVE_MIN_DELAY) * (1 + state.error_rate))
+
+    def wait(self, host):
+        """ Sleeps until request to host can be sent. Returns slept time. """
+        sleep_time = self.reserve(host)
+        if sleep_time > 0:
+            time.sleep(sleep_time)
+        return sleep_time
+
+
+# time spent opening connections in current thread, see InstrumentedHTTPAdapter
+_connect_timing = threading.local()
+
+
+def _timed_connect(connect):
+    def wrapper(self):
+        start_time = time.perf_counter()
+        try:
+            return connect(self)
+        finally:
+            _connect_timing.total = getattr(_connect_timing, "total", 0.0) + time.perf_counter() - start_time
+    return wrapper
+
+
+class TimedHTTPConnection(urllib3.connection.HTTPConnection):
+    connect = _timed_connect(urllib3.connection.HTTPConnection.connect)
+
+
+class TimedHTTPSConnection(urllib3.connection.HTTPSConnection):
+    connect = _timed_connect(urllib3.connection.HTTPSConnection.connect)
+
+
+class TimedHTTPConnectionPool(urllib3.HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(urllib3.HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class InstrumentedHTTPAdapter(requests.adapters.HTTPAdapter):
+    """
+    HTTPAdapter that measures time of opening new connections (DNS lookup, TCP connect and TLS handshake).
+    urllib3 resolves host inside of connect, so DNS time can't be measured separately.
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool,
+        }
+
+
+class Histogram(object):
+    """ Histogram of durations with exponential buckets, summarizes values without storing them """
+
+    BUCKETS = [0.001 * 2**i for i in range(20)]  # upper bounds, 1ms to ~9min
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, percent):
+        """ Returns upper bound of bucket containing percentile (max value for last bucket) """
+        if not self.count:
+            return None
+        rank = self.count * percent / 100.0
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= rank and count:
+                return min(self.BUCKETS[i], self.max) if i < len(self.BUCKETS) else self.max
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": self.sum / self.count if self.count else None,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+        }
+
+
+class RequestMetrics(object):
+    """
+    Per-host metrics of FixedRequests.
+
+    Timings (histograms, seconds):
+        connect     opening new connections (DNS lookup + TCP connect + TLS handshake)
+        ttfb        from sending request to parsing response headers
+        total       whole request attempt, including reading body (except streamed requests)
+        delay       waiting in _delay_requests() (request_delay, backoff, Retry-After)
+    Counters:
+        requests, retries by status code (or "connection_error"), bytes_received
+
+    Callbacks are called with dict describing every request attempt.
+    """
+
+    TIMINGS = ["connect", "ttfb", "total", "delay"]
+
+    def __init__(self):
+        self.hosts = {}
+        self.callbacks = []
+        self.lock = threading.Lock()
+
+    def add_callback(self, callback):
+        self.callbacks.append(callback)
+
+    def _get_host(self, host):
+        if host not in self.hosts:
+            self.hosts[host] = {
+                "timings": {name: Histogram() for name in self.TIMINGS},
+                "requests": 0,
+                "retries": collections.Counter(),
+                "bytes_received": 0,
+            }
+        return self.hosts[host]
+
+    def add_bytes(self, host, length):
+        with self.lock:
+            self._get_host(host)["bytes_received"] += length
+
+    def record_attempt(self, event):
+        """ event : dict with host, status_code, error, connect, ttfb, total, delay, bytes_received """
+        with self.lock:
+            host = self._get_host(event["host"])
+            host["requests"] += 1
+            host["bytes_received"] += event.get("bytes_received") or 0
+            if event.get("error"):
+                host["retries"][event["error"]] += 1
+            for name in self.TIMINGS:
+                if event.get(name) is not None:
+                    host["timings"][name].add(event[name])
+        for callback in self.callbacks:
+            try:
+                callback(event)
+            except Exception:
+                logger.exception("Metrics callback failed")
+
+    def get_summary(self):
+        """ Returns {host: {requests, retries, bytes_received, connect, ttfb, total, delay}} """
+        with self.lock:
+            summary = {}
+            for host_name, host in self.hosts.items():
+                summary[host_name] = {
+                    "requests": host["requests"],
+                    "retries": dict(host["retries"]),
+                    "bytes_received": host["bytes_received"],
+                }
+                for name in self.TIMINGS:
+                    summary[host_name][name] = host["timings"][name].summary()
+            return summary
+
+
+# vary: ((header, value sent in request), ...) for headers listed in Vary header of response
+CacheEntry = collections.namedtuple("CacheEntry", "response expires vary", defaults=[()])
+
+
+class ResponseCache(object):
+    """
+    Cache of GET responses. In-memory LRU, optionally backed by on-disk store that persists between runs.
+
+    Freshness is decided by Cache-Control (no-store, no-cache, max-age) and Expires headers.
+    Stale responses with ETag/Last-Modified are revalidated with If-None-Match/If-Modified-Since,
+    and 304 response reuses cached body.
+
+    Responses with Vary header are reused only for requests with the same values of listed headers
+    (Vary: * is never stored). Requests with Authorization or Cookie header must not use the cache at all,
+    see is_cacheable_request().
+    """
+
+    PRIVATE_HEADERS = ("Authorization", "Cookie")
+
+    def __init__(self, max_entries=1000, cache_dir=None):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        self.entries = collections.OrderedDict()  # {key: CacheEntry}, least recently used first
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "revalidated": 0, "misses": 0, "stored": 0}
+
+    @staticmethod
+    def get_key(url, params=None):
+        prepared = requests.models.PreparedRequest()
+        prepared.prepare_url(url, params)
+        return prepared.url
+
+    @classmethod
+    def is_cacheable_request(cls, headers):
+        """ headers : headers that will be sent with request, including cookies """
+        return not any(headers.get(name) for name in cls.PRIVATE_HEADERS)
+
+    def get_stats(self):
+        """ Returns counters and hit rate (fresh hits and successful revalidations) """
+        with self.lock:
+            stats = dict(self.stats)
+        lookups = stats["hits"] + stats["revalidated"] + stats["misses"]
+        stats["hit_rate"] = float(stats["hits"] + stats["revalidated"]) / lookups if lookups else 0.0
+        return stats
+
+    def lookup(self, key, request_headers=None):
+        """
+        Returns tuple(fresh cached response or None, stale entry that can be revalidated or None)
+        request_headers : headers that will be sent with request, compared with Vary of cached response
+        """
+        entry = self._get_entry(key)
+        if entry is None:
+            return None, None
+        if any((request_headers or {}).get(name) != value for name, value in entry.vary):
+            return None, None
+        if entry.expires > time.time():
+            with self.lock:
+                self.stats["hits"] += 1
+            return entry.response, None
+        return None, (entry if self.get_conditional_headers(entry) else None)
+
+    @staticmethod
+    def get_conditional_headers(entry):
+        """ Returns headers of request revalidating stale entry """
+        headers = {}
+        if entry.response.headers.get("ETag"):
+            headers["If-None-Match"] = entry.response.headers["ETag"]
+        if entry.response.headers.get("Last-Modified"):
+            headers["If-Modified-Since"] = entry.response.headers["Last-Modified"]
+        return headers
+
+    def update(self, key, response, entry=None):
+        """
+        Stores response, or returns cached response if it was successfully revalidated (304)
+        entry : stale entry returned by lookup(), revalidated even if it was evicted from cache in the meantime
+        """
+        if response.status_code == 304:
+            if entry is not None:
+                # content headers of 304 response don't describe cached body
+                entry.response.headers.update(
+                    {k: v for k, v in response.headers.items() if not k.lower().startswith("content-")}
+                )
+                self._set_entry(key, entry._replace(expires=self._get_expires(entry.response.headers)))
+                with self.lock:
+                    self.stats["revalidated"] += 1
+                return entry.response
+
+        with self.lock:
+            self.stats["misses"] += 1
+        vary = self._get_vary(response)
+        if response.status_code == 200 and vary is not None:
+            expires = self._get_expires(response.headers)
+            validators = response.headers.get("ETag") or response.headers.get("Last-Modified")
+            if expires is not None and (expires > time.time() or validators):
+                self._set_entry(key, CacheEntry(response, expires, vary))
+                with self.lock:
+                    self.stats["stored"] += 1
+        return response
+
+    @staticmethod
+    def _get_vary(response):
+        """ Returns values of request headers listed in Vary header, None if response must not be stored """
+        names = [x.strip() for x in response.headers.get("Vary", "").split(",") if x.strip()]
+        if "*" in names:
+            return None
+        request_headers = response.request.headers if names else {}
+        return tuple((name, request_headers.get(name)) for name in names)
+
+    @staticmethod
+    def _get_expires(headers):
+        """ Returns expiration timestamp, 0 if response must be revalidated, None if it must not be stored """
+        directives = {}
+        for directive in headers.get("Cache-Control", "").split(","):
+            name, _, value = directive.strip().partition("=")
+            if name:
+                directives[name.lower()] = value.strip().strip('"')
+
+        if "no-store" in directives:
+            return None
+        if "no-cache" in directives:
+            return 0.0
+        if "max-age" in directives:
+            try:
+                return time.time() + int(directives["max-age"]) - int(headers.get("Age", 0))
+            except ValueError:
+                return 0.0
+        if headers.get("Expires"):
+            try:
+                return email.utils.parsedate_to_datetime(headers["Expires"]).timestamp()
+            except (TypeError, ValueError):
+                return 0.0
+        return 0.0
+
+    def _get_path(self, key):
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode("utf-8")).hexdigest())
+
+    def _get_entry(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+        if not self.cache_dir:
+            return None
+
+        try:
+            with open(self._get_path(key), "rb") as f:
+                entry = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            logger.warning("Corrupted response cache file for {}".format(key))
+            return None
+        self._set_entry(key, entry, persist=False)
+        return entry
+
+    def _set_entry(self, key, entry, persist=True):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        if self.cache_dir and persist:
+            # write to temporary file and replace, so that readers never see partial file
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir)
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(entry, f)
+            os.replace(tmp_path, self._get_path(key))
+
+
+class RejectCookiesPolicy(http.cookiejar.DefaultCookiePolicy):
+    """ Doesn't accept any cookies from responses. Cookies set by user are still sent. """
+
+    def set_ok(self, cookie, request):
+        return False
+
 
 class FixedRequests(object):
     DEFAULT_HEADERS = {'user-agent': "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:48.0) Gecko/20100101 Firefox/48.0"}
 
-    def __init__(self, use_cookies=True, max_errors=5, cloudscraper=False):
+    def __init__(self, use_cookies=True, max_errors=5, cloudscraper=False,
+                 pool_connections=10, pool_maxsize=10, pool_block=False, max_retries=0):
+        """
+        pool_connections : int
+            Number of hosts with cached connection pools
+        pool_maxsize : int
+            Max number of kept-alive connections to one host, should be at least number of threads used with map()
+        pool_block : boolean
+            If True, requests wait for free connection instead of opening new one when pool is full
+        max_retries : int | urllib3.util.Retry
+            Low level retries of urllib3 (not applied with cloudscraper), independent of max_errors
+        """
         self.use_cookies = use_cookies
         self.max_errors = max_errors
         self.error_sleep_time = 1
@@ -33,14 +490,30 @@ class FixedRequests(object):
         else:
             self.requests_class = requests
             self.requests_session = requests.Session()
+            adapter = InstrumentedHTTPAdapter(
+                pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                max_retries=max_retries, pool_block=pool_block
+            )
+            self.requests_session.mount("http://", adapter)
+            self.requests_session.mount("https://", adapter)
+        if not self.use_cookies:
+            self.requests_session.cookies.set_policy(RejectCookiesPolicy())
 
         # requests arguments
         self.args_timeout = 30
         self.args_headers = dict(self.DEFAULT_HEADERS)
 
         # request delay
-        self.request_delay = 0  # min time delay between requests
-        self.last_request_time = 0
+        self.rate_limiter = HostRateLimiter()
+        self.request_delay = 0  # min time delay between requests to one host, kept in rate_limiter
+        self.last_request_time = 0  # time.time() of last sent request
+        self.max_retry_after = 300  # max obeyed value of Retry-After header
+
+        # response cache
+        self.response_cache = None
+
+        # metrics
+        self.metrics = None
 
     ###
     # Getters, Setters, Updaters
@@ -59,6 +532,10 @@ class FixedRequests(object):
         return dict(self.requests_session.cookies)
 
     def set_cookies(self, new_cookies):
+        if not isinstance(new_cookies, http.cookiejar.CookieJar):
+            new_cookies = requests.cookies.cookiejar_from_dict(new_cookies)
+        if not self.use_cookies:
+            new_cookies.set_policy(RejectCookiesPolicy())
         self.requests_session.cookies = new_cookies
 
     def update_cookies(self, new_cookies):
@@ -70,9 +547,76 @@ class FixedRequests(object):
     def set_timeout(self, new_timeout):
         self.args_timeout = new_timeout
 
+    @property
+    def request_delay(self):
+        return self.rate_limiter.delay
+
+    @request_delay.setter
+    def request_delay(self, delay):
+        self.rate_limiter.set_delay(delay)
+
     def set_request_delay(self, delay):
         self.request_delay = delay
 
+    def enable_cache(self, max_entries=1000, cache_dir=None):
+        """
+        Enables cache of GET responses, see ResponseCache.
+        cache_dir : string
+            Directory of on-disk store, if None responses are cached only in memory
+        """
+        self.response_cache = ResponseCache(max_entries=max_entries, cache_dir=cache_dir)
+
+    def disable_cache(self):
+        self.response_cache = None
+
+    def get_cache_stats(self):
+        return self.response_cache.get_stats() if self.response_cache is not None else None
+
+    def enable_metrics(self, callback=None):
+        """
+        Starts collecting request metrics, see RequestMetrics.
+        callback : callable
+            Called with dict describing every request attempt
+        """
+        self.metrics = RequestMetrics()
+        if callback is not None:
+            self.metrics.add_callback(callback)
+
+    def disable_metrics(self):
+        self.metrics = None
+
+    def get_metrics_summary(self):
+        return self.metrics.get_summary() if self.metrics is not None else None
+
+    def get_connection_stats(self):
+        """
+        Returns number of opened connections and sent requests of currently pooled hosts.
+        Requests that didn't open new connection reused kept-alive one.
+        """
+        stats = {"pools": 0, "connections": 0, "requests": 0}
+        for adapter in set(self.requests_session.adapters.values()):
+            poolmanager = getattr(adapter, "poolmanager", None)
+            if poolmanager is None:
+                continue
+            for key in list(poolmanager.pools.keys()):
+                pool = poolmanager.pools.get(key)
+                if pool is None:  # evicted meanwhile
+                    continue
+                stats["pools"] += 1
+                stats["connections"] += pool.num_connections
+                stats["requests"] += pool.num_requests
+        stats["reused"] = max(0, stats["requests"] - stats["connections"])
+        stats["reuse_ratio"] = float(stats["reused"]) / stats["requests"] if stats["requests"] else 0.0
+        return stats
+
+    def set_adaptive_throttle(self, enabled=True, max_delay=60):
+        """
+        Adaptive throttling widens delay between requests to host on 429/503 responses and shrinks it
+        again on successful responses, never below request_delay.
+        """
+        self.rate_limiter.adaptive = enabled
+        self.rate_limiter.max_delay = max_delay
+
     ###
     # Methods from requests library
     ###
@@ -87,6 +631,129 @@ class FixedRequests(object):
         kwargs["req_type"] = "post"
         return self._request(**kwargs)
 
+    ###
+    # Concurrent requests
+    ###
+
+    def map(self, requests_kwargs, max_workers=8, return_exceptions=False):
+        """
+        Sends requests concurrently from thread pool.
+        request_delay and error backoff are applied per host, so different hosts don't slow down each other.
+
+        requests_kwargs : iterable of dicts
+            Keyword arguments of each request, same as for get()/post(). "req_type" defaults to "get".
+        return_exceptions : boolean
+            If True, exceptions of failed requests are returned instead of responses, otherwise first one is raised.
+
+        returns : list of responses in the same order as requests_kwargs
+        """
+        requests_kwargs = [dict(x) for x in requests_kwargs]
+
+        def send(kwargs):
+            try:
+                return self._request(**kwargs)
+            except Exception as e:
+                if return_exceptions:
+                    return e
+                raise
+
+        # submit requests round-robin by host, so that workers are not all blocked by delay of one host
+        by_host = collections.OrderedDict()
+        for i, kwargs in enumerate(requests_kwargs):
+            by_host.setdefault(self._get_host(kwargs.get("url")), collections.deque()).append(i)
+        order = []
+        while by_host:
+            for host in list(by_host):
+                order.append(by_host[host].popleft())
+                if not by_host[host]:
+                    del(by_host[host])
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {i: executor.submit(send, requests_kwargs[i]) for i in order}
+            return [futures[i].result() for i in range(len(requests_kwargs))]
+
+    def get_many(self, urls, max_workers=8, return_exceptions=False, **kwargs):
+        """ Concurrent GET of urls, with same keyword arguments for every request. See map(). """
+        return self.map(
+            [dict(kwargs, url=url, req_type="get") for url in urls],
+            max_workers=max_workers, return_exceptions=return_exceptions
+        )
+
+    ###
+    # Downloads
+    ###
+
+    def download(self, url, dest, segments=1, chunk_size=DOWNLOAD_CHUNK_SIZE, expected_size=None,
+                 expected_hash=None, hash_algorithm="sha256", **kwargs):
+        """
+        Streams url into file in chunks, without keeping whole response in memory.
+        Data is written into "<dest>.part", which is renamed to dest after verification.
+        Interrupted transfers are resumed with Range requests. Single segment downloads also resume
+        from "<dest>.part" left by previous call.
+
+        segments : int
+            If > 1 and server supports range requests, file is split into this many parts downloaded in parallel
+        expected_size : int
+            Expected file size in bytes. Size reported by server is always verified.
+        expected_hash : string
+            Expected hex digest of file, computed with hash_algorithm (any hashlib algorithm)
+        kwargs :
+            Additional arguments of GET requests, same as for get()
+
+        returns : size of downloaded file
+        """
+        part_path = dest + ".part"
+        kwargs = self._fill_kwargs(**kwargs)
+
+        total_size = None
+        if segments > 1:
+            total_size = self._get_range_total_size(url, kwargs)
+            if total_size is None or total_size < segments:
+                logger.debug("Server doesn't support range requests, downloading {} in one segment".format(url))
+                segments = 1
+
+        if segments > 1:
+            with open(part_path, "wb") as f:
+                f.truncate(total_size)
+            segment_size = -(-total_size // segments)
+            ranges = [(x, min(x + segment_size, total_size)) for x in range(0, total_size, segment_size)]
+            try:
+                with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+                    futures = [
+                        executor.submit(self._download_range, url, part_path, start, end, chunk_size, kwargs)
+                        for start, end in ranges
+                    ]
+                    for future in futures:
+                        future.result()
+            except Exception:
+                os.remove(part_path)  # file with holes can't be resumed by size
+                raise
+            size = total_size
+        else:
+            if not os.path.exists(part_path):
+                open(part_path, "wb").close()
+            size, total_size = self._download_range(url, part_path, os.path.getsize(part_path), None, chunk_size,
+                                                    kwargs)
+
+        # verify
+        try:
+            for name, expected in [("server", total_size), ("expected", expected_size)]:
+                if expected is not None and size != expected:
+                    raise Exception("Downloaded {} bytes of {}, but {} size is {}".format(size, url, name, expected))
+            if expected_hash is not None:
+                hasher = hashlib.new(hash_algorithm)
+                with open(part_path, "rb") as f:
+                    for chunk in iter(lambda: f.read(chunk_size), b""):
+                        hasher.update(chunk)
+                if hasher.hexdigest().lower() != expected_hash.lower():
+                    raise Exception("Hash of {} is {}, expected {}".format(url, hasher.hexdigest(), expected_hash))
+        except Exception:
+            os.remove(part_path)  # don't resume corrupted data
+            raise
+
+        os.replace(part_path, dest)
+        return size
+
     ###
     # Private methods
     ###
@@ -103,6 +770,22 @@ class FixedRequests(object):
             kwargs["req_type"] = "get"
         req_type = kwargs["req_type"]
         del(kwargs["req_type"])
+        host = self._get_host(kwargs.get("url"))
+
+        # return fresh cached response, or revalidate stale one
+        cache = self.response_cache
+        cache_key = None
+        stale_entry = None
+        request_headers = None
+        if cache is not None and req_type == "get" and not kwargs.get("stream"):
+            request_headers = self._get_request_headers(kwargs)
+        if request_headers is not None and cache.is_cacheable_request(request_headers):
+            cache_key = cache.get_key(kwargs.get("url"), kwargs.get("params"))
+            cached_response, stale_entry = cache.lookup(cache_key, request_headers)
+            if cached_response is not None:
+                return cached_response
+            if stale_entry is not None:
+                kwargs["headers"] = dict(kwargs["headers"], **cache.get_conditional_headers(stale_entry))
 
         r = None
         error_num = 0
@@ -111,24 +794,36 @@ class FixedRequests(object):
                 raise Exception("Request failed too many times ("+str(error_num)+" times).")
 
             response_ok = True
+            attempt = {"host": host, "url": kwargs.get("url"), "req_type": req_type, "attempt": error_num}
             try:
-                self._delay_requests(error_num=error_num)
+                attempt["delay"] = self._delay_requests(error_num=error_num, host=host)
+                self.last_request_time = time.time()
+                _connect_timing.total = 0.0
+                start_time = time.perf_counter()
                 if req_type == "get":
                     r = self.requests_session.get(**kwargs)
                 elif req_type == "post":
                     r = self.requests_session.post(**kwargs)
                 else:
                     raise Exception("Unknown request type!")
+                if self.metrics is not None:
+                    attempt["total"] = time.perf_counter() - start_time
+                    attempt["ttfb"] = r.elapsed.total_seconds()
+                    attempt["status_code"] = r.status_code
+                    attempt["bytes_received"] = 0 if kwargs.get("stream") else len(r.content)
 
-                self._log_status_code(r.status_code)
-                if r.status_code == 429:  # too many requests
-                    response_ok = False
-                elif r.status_code == 503:  # service unavailable
-                    response_ok = False
+                response_ok = self._check_response(host, r.status_code, r.headers)
+                if not response_ok:
+                    attempt["error"] = r.status_code
 
             except requests.exceptions.ConnectionError:
                 logger.warning("Connection refused")
                 response_ok = False
+                attempt["error"] = "connection_error"
+
+            if self.metrics is not None:
+                attempt["connect"] = _connect_timing.total or None
+                self.metrics.record_attempt(attempt)
 
             if response_ok:
                 break
@@ -137,22 +832,133 @@ class FixedRequests(object):
                 time.sleep(self.error_sleep_time)
                 continue
 
-        # update cookies
-        if not self.use_cookies:
-            self.set_cookies({})
+        if cache_key is not None:
+            r = cache.update(cache_key, r, stale_entry)
 
         return r
 
-    def _delay_requests(self, error_num):
-        """ makes sure that self.request_delay is obeyed """
+    def _get_request_headers(self, kwargs):
+        """ Returns headers that session would send with request, including cookies and authorization """
+        request = requests.Request("GET", kwargs.get("url"), params=kwargs.get("params"),
+                                   headers=kwargs.get("headers"), cookies=kwargs.get("cookies"),
+                                   auth=kwargs.get("auth"))
+        return self.requests_session.prepare_request(request).headers
+
+    def _get_range_total_size(self, url, kwargs):
+        """ Returns size of file if server supports range requests, else None """
+        headers = dict(kwargs["headers"], Range="bytes=0-0")
+        r = self._request(**dict(kwargs, url=url, headers=headers, stream=True))
+        r.close()
+        if r.status_code != 206:
+            return None
+        return self._parse_content_range_total(r.headers.get("Content-Range"))
+
+    def _download_range(self, url, part_path, start, end, chunk_size, kwargs):
+        """
+        Downloads bytes from start to end (exclusive, None for end of file) into part_path at the same offset.
+        Transfer errors are retried from last written byte.
+
+        returns : tuple(end position, total size reported by server or None)
+        """
+        position = start
+        total_size = None
+        error_num = 0
+        with open(part_path, "r+b") as f:
+            while end is None or position < end:
+                if error_num >= self.max_errors:
+                    raise Exception("Download failed too many times ("+str(error_num)+" times).")
+
+                headers = dict(kwargs["headers"])
+                if position > 0 or end is not None:
+                    headers["Range"] = "bytes={}-{}".format(position, "" if end is None else end - 1)
+                last_position = position
+                r = None
+                try:
+                    r = self._request(**dict(kwargs, url=url, headers=headers, stream=True))
+                    if r.status_code == 416 and end is None and position > 0:
+                        # nothing left to download
+                        total_size = self._parse_content_range_total(r.headers.get("Content-Range"))
+                        break
+                    elif r.status_code == 200:
+                        if end is not None:
+                            raise Exception("Server doesn't support range requests: {}".format(url))
+                        # server ignored range (e.g. resume of .part left by previous call), restart from beginning
+                        position = last_position = 0
+                        f.truncate(0)
+                        if r.headers.get("Content-Length", "").isdigit():
+                            total_size = int(r.headers["Content-Length"])
+                    elif r.status_code == 206:
+                        total_size = self._parse_content_range_total(r.headers.get("Content-Range"))
+                    else:
+                        raise Exception("Download of {} failed with status code {}".format(url, r.status_code))
+
+                    f.seek(position)
+                    for chunk in r.iter_content(chunk_size):
+                        f.write(chunk)
+                        position += len(chunk)
+                        if self.metrics is not None:
+                            self.metrics.add_bytes(self._get_host(url), len(chunk))
+                    if end is None and (total_size is None or position >= total_size):
+                        break
+                    if position == last_position:  # server closed connection without error and without data
+                        error_num += 1
+
+                except requests.exceptions.RequestException as e:
+                    error_num += 1
+                    logger.warning("Download of {} interrupted at byte {}, resuming: {}".format(url, position, e))
+                    time.sleep(self.error_sleep_time)
+                finally:
+                    if r is not None:
+                        r.close()
+
+            if end is None:
+                f.truncate(position)
+        return position, total_size
+
+    @staticmethod
+    def _parse_content_range_total(value):
+        """ 'bytes 0-0/1234' => 1234 """
+        total = (value or "").rpartition("/")[2].strip()
+        return int(total) if total.isdigit() else None
+
+    def _delay_requests(self, error_num, host=None):
+        """ makes sure that self.request_delay is obeyed for host, returns slept time """
         if error_num != 0:
-            sleep_time = 2**error_num
-            time.sleep(sleep_time)
+            # exponential backoff, also delays other threads sending requests to same host
+            self.rate_limiter.penalize(host, 2**error_num)
+        return self.rate_limiter.wait(host)
+
+    def _check_response(self, host, status_code, headers):
+        """ Returns False if request should be retried. Updates throttling of host. """
+        self._log_status_code(status_code)
+        if status_code not in [429, 503]:  # too many requests, service unavailable
+            self.rate_limiter.record_success(host)
+            return True
 
-        elif self.request_delay > 0:
-            deltat = time.time() - self.last_request_time
-            if deltat < self.request_delay:
-                time.sleep(float(self.request_delay)-deltat)
+        self.rate_limiter.record_error(host)
+        retry_after = self._parse_retry_after(headers.get("Retry-After"))
+        if retry_after is not None:
+            logger.debug("Retry-After {}s for host {}".format(retry_after, host))
+            self.rate_limiter.penalize(host, min(retry_after, self.max_retry_after))
+        return False
+
+    @staticmethod
+    def _parse_retry_after(value):
+        """ Returns seconds from Retry-After header value (seconds or HTTP date) or None """
+        if not value:
+            return None
+        value = value.strip()
+        if value.isdigit():
+            return float(value)
+        try:
+            retry_time = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        return max(0.0, retry_time.timestamp() - time.time())
+
+    @staticmethod
+    def _get_host(url):
+        return urllib.parse.urlsplit(url or "").netloc.lower()
 
     def _fill_kwargs(self, **kwargs):
         if "timeout" not in kwargs:
@@ -194,3 +1000,194 @@ class FixedRequests(object):
 
         # log status code
         logger.debug("{} - {} {}".format(code_type, status_code, code_info))
+
+
+class AsyncFixedRequests(object):
+    """
+    asyncio variant of FixedRequests with the same retry semantics, using pooled aiohttp session.
+    Delays and backoff use non-blocking sleeps, so one event loop can have many requests in flight.
+
+    Returned responses are aiohttp.ClientResponse objects with already read body
+    (use r.status, await r.text(), await r.json()).
+
+    >>> async with AsyncFixedRequests() as fr:
+    >>>     r = await fr.get(url='https://example.com')
+    """
+    DEFAULT_HEADERS = FixedRequests.DEFAULT_HEADERS
+
+    def __init__(self, use_cookies=True, max_errors=5, limit=100, limit_per_host=0):
+        """
+        limit : int
+            Max number of open connections, 0 for unlimited
+        limit_per_host : int
+            Max number of open connections to one host, 0 for unlimited
+        """
+        if aiohttp is None:
+            raise ImportError("AsyncFixedRequests requires aiohttp library")
+        self.use_cookies = use_cookies
+        self.max_errors = max_errors
+        self.error_sleep_time = 1
+
+        # session is created lazily, because it must be created inside of running event loop
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.requests_session = None
+        self.cookie_jar = None
+
+        # requests arguments
+        self.args_timeout = 30
+        self.args_headers = dict(self.DEFAULT_HEADERS)
+
+        # request delay
+        self.rate_limiter = HostRateLimiter()
+        self.request_delay = 0  # min time delay between requests to one host, kept in rate_limiter
+        self.last_request_time = 0  # time.time() of last sent request
+        self.max_retry_after = 300  # max obeyed value of Retry-After header
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def close(self):
+        if self.requests_session is not None:
+            await self.requests_session.close()
+        self.requests_session = None
+
+    ###
+    # Getters, Setters, Updaters
+    ###
+
+    get_headers = FixedRequests.get_headers
+    set_headers = FixedRequests.set_headers
+    update_headers = FixedRequests.update_headers
+    get_timeout = FixedRequests.get_timeout
+    set_timeout = FixedRequests.set_timeout
+    request_delay = FixedRequests.request_delay
+    set_request_delay = FixedRequests.set_request_delay
+    set_adaptive_throttle = FixedRequests.set_adaptive_throttle
+
+    def get_cookies(self):
+        return {cookie.key: cookie.value for cookie in self._get_cookie_jar()}
+
+    def set_cookies(self, new_cookies):
+        self._get_cookie_jar().clear()
+        self.update_cookies(new_cookies)
+
+    def update_cookies(self, new_cookies):
+        self._get_cookie_jar().update_cookies(new_cookies)
+
+    ###
+    # Methods from requests library
+    ###
+
+    async def get(self, **kwargs):
+        """ Only accepts keyword arguments """
+        kwargs["req_type"] = "get"
+        return await self._request(**kwargs)
+
+    async def post(self, **kwargs):
+        """ Only accepts keyword arguments """
+        kwargs["req_type"] = "post"
+        return await self._request(**kwargs)
+
+    ###
+    # Concurrent requests
+    ###
+
+    async def map(self, requests_kwargs, return_exceptions=False):
+        """
+        Sends requests concurrently, see FixedRequests.map().
+        Number of simultaneous connections is limited by `limit` and `limit_per_host`.
+        """
+        return await asyncio.gather(
+            *[self._request(**dict(kwargs)) for kwargs in requests_kwargs],
+            return_exceptions=return_exceptions
+        )
+
+    async def get_many(self, urls, return_exceptions=False, **kwargs):
+        """ Concurrent GET of urls, with same keyword arguments for every request. See map(). """
+        return await self.map(
+            [dict(kwargs, url=url, req_type="get") for url in urls],
+            return_exceptions=return_exceptions
+        )
+
+    ###
+    # Private methods
+    ###
+
+    _check_response = FixedRequests._check_response
+    _parse_retry_after = staticmethod(FixedRequests._parse_retry_after)
+    _log_status_code = staticmethod(FixedRequests._log_status_code)
+
+    def _get_cookie_jar(self):
+        if self.cookie_jar is None:
+            self.cookie_jar = aiohttp.CookieJar(unsafe=True) if self.use_cookies else aiohttp.DummyCookieJar()
+        return self.cookie_jar
+
+    def _get_session(self):
+        if self.requests_session is None:
+            connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host)
+            self.requests_session = aiohttp.ClientSession(connector=connector, cookie_jar=self._get_cookie_jar())
+        return self.requests_session
+
+    async def _request(self, **kwargs):
+        """
+        * Generic request function
+        * Only accepts keyword arguments
+        * Needs to have "req_type": "get"/"post"
+        """
+        kwargs = self._fill_kwargs(**kwargs)
+
+        if "req_type" not in kwargs:
+            kwargs["req_type"] = "get"
+        req_type = kwargs["req_type"]
+        del(kwargs["req_type"])
+        host = FixedRequests._get_host(kwargs.get("url"))
+
+        session = self._get_session()
+        r = None
+        error_num = 0
+        while True:
+            if error_num >= self.max_errors:
+                raise Exception("Request failed too many times ("+str(error_num)+" times).")
+
+            response_ok = True
+            try:
+                await self._delay_requests(error_num=error_num, host=host)
+                if req_type not in ["get", "post"]:
+                    raise Exception("Unknown request type!")
+                self.last_request_time = time.time()
+                async with session.request(req_type.upper(), **kwargs) as r:
+                    await r.read()  # body stays available after connection is released
+
+                response_ok = self._check_response(host, r.status, r.headers)
+
+            except aiohttp.ClientConnectionError:
+                logger.warning("Connection refused")
+                response_ok = False
+
+            if response_ok:
+                break
+            else:
+                error_num += 1
+                await asyncio.sleep(self.error_sleep_time)
+                continue
+
+        return r
+
+    async def _delay_requests(self, error_num, host=None):
+        """ makes sure that self.request_delay is obeyed for host """
+        if error_num != 0:
+            # exponential backoff, also delays other requests to same host
+            self.rate_limiter.penalize(host, 2**error_num)
+        sleep_time = self.rate_limiter.reserve(host)
+        if sleep_time > 0:
+            await asyncio.sleep(sleep_time)
+
+    def _fill_kwargs(self, **kwargs):
+        kwargs["timeout"] = aiohttp.ClientTimeout(total=kwargs.get("timeout", self.args_timeout))
+        if "headers" not in kwargs:
+            kwargs["headers"] = self.args_headers
+        return kwargs
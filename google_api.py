@@ -6,10 +6,17 @@ from oauth2client.file import Storage
 from oauth2client.tools import run_flow
 import httplib2
 import requests
+import requests.adapters
 
 import os
+import re
+import time
+import random
 import importlib.resources
 import json
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 
 
 class GoogleAPI(object):
@@ -44,8 +51,27 @@ class GoogleAPI(object):
     >>>     BASE_URL = 'https://www.googleapis.com/gmail/v1/users'
     >>>     def users_getprofile(self, user_id='me', **kwargs):
     >>>         return self.call('GET', url=self.BASE_URL+'/{}/profile'.format(user_id), **kwargs)
+
+    All pages of paginated list
+    >>> for message in api.call_paginated('GET', 'https://www.googleapis.com/gmail/v1/users/me/messages',
+    >>>                                   items_key='messages'):
+    >>>     print(message['id'])
+
+    Many calls in one batch request
+    >>> api.call_batch([
+    >>>     {'verb': 'GET', 'url': 'https://www.googleapis.com/gmail/v1/users/me/messages/' + message_id}
+    >>>     for message_id in message_ids
+    >>> ])
     """
 
+    TOKEN_URL = 'https://accounts.google.com/o/oauth2/token'
+    TOKEN_REFRESH_MARGIN = 300  # seconds before expiry when access token is refreshed
+    BATCH_URL = 'https://www.googleapis.com/batch/{api}/{version}'
+    MAX_BATCH_SIZE = 100  # limit of google batch endpoint (gmail recommends at most 50)
+    POOL_SIZE = 16  # max number of kept-alive connections, should be >= max_workers of call_many()
+    RATE_LIMIT_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded'}
+    MAX_BACKOFF = 64  # seconds
+
     def __init__(self, client_secret=None, credentials=None, scopes=None):
         """
         client_secret : string
@@ -75,6 +101,21 @@ class GoogleAPI(object):
         self.credentials = credentials if credentials else self.credentials
         self.scopes = scopes if scopes else self.scopes
 
+        # cached access token, shared by all threads
+        self.access_token = None
+        self.access_token_expires = 0
+        self.token_lock = threading.Lock()
+        self.credentials_data = None
+
+        # persistent session, keeps connections alive between calls
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=self.POOL_SIZE, pool_maxsize=self.POOL_SIZE)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        # when rate limit is exceeded, all threads of call_many() wait until this time
+        self.rate_limit_until = 0
+
     def authorize_credentials(self, reauth=False):
         """
         Returns OAuth2 credentials(tokens, etc.).
@@ -94,33 +135,73 @@ class GoogleAPI(object):
             flow = flow_from_clientsecrets(self.client_secret, scope=self.scopes, prompt='consent')
             http = httplib2.Http()
             run_flow(flow, storage, http=http)
+        self.credentials_data = None
+        self.invalidate_access_token()
 
     def refresh_access_token(self):
         """
         Access token expires after about 1 hour. That's why it must be remade from refresh token.
+        New token is cached, see get_access_token().
 
         returns : access_token
         """
-        with open(self.credentials, 'r') as f:
-            data = json.loads(f.read())
-            client_id = data['client_id']
-            client_secret = data['client_secret']
-            refresh_token = data['refresh_token']
-        request = requests.post(
-            'https://accounts.google.com/o/oauth2/token',
+        if self.credentials_data is None:
+            with open(self.credentials, 'r') as f:
+                self.credentials_data = json.loads(f.read())
+        request = self.session.post(
+            self.TOKEN_URL,
             data={
                 'grant_type':    'refresh_token',
-                'client_id':     client_id,
-                'client_secret': client_secret,
-                'refresh_token': refresh_token
+                'client_id':     self.credentials_data['client_id'],
+                'client_secret': self.credentials_data['client_secret'],
+                'refresh_token': self.credentials_data['refresh_token']
             },
             headers={
                 'Content-Type': 'application/x-www-form-urlencoded',
                 'Accept': 'application/json'
-            }
+            },
+            timeout=30
         )
         response = json.loads(request.text)
-        return response['access_token']
+        if 'access_token' not in response:
+            raise Exception('Access token refresh failed: {}'.format(response))
+        self.access_token = response['access_token']
+        self.access_token_expires = time.time() + int(response.get('expires_in', 3600))
+        return self.access_token
+
+    def get_access_token(self):
+        """
+        Returns cached access token, refreshes it TOKEN_REFRESH_MARGIN seconds before it expires.
+        Thread-safe, only one thread refreshes token. While token is still valid, other threads
+        keep using it instead of waiting for refresh.
+
+        returns : access_token
+        """
+        now = time.time()
+        if self.access_token is not None and now < self.access_token_expires - self.TOKEN_REFRESH_MARGIN:
+            return self.access_token
+        still_valid = self.access_token is not None and now < self.access_token_expires
+        if not self.token_lock.acquire(blocking=not still_valid):
+            return self.access_token  # other thread is refreshing it
+        try:
+            # token could be refreshed by other thread while waiting for lock
+            if self.access_token is None or time.time() >= self.access_token_expires - self.TOKEN_REFRESH_MARGIN:
+                self.refresh_access_token()
+            return self.access_token
+        finally:
+            self.token_lock.release()
+
+    def invalidate_access_token(self, access_token=None):
+        """
+        Forces refresh of access token on next call.
+
+        access_token : string
+            Invalidate only if this token is still cached (not refreshed yet by other thread)
+        """
+        with self.token_lock:
+            if access_token is None or access_token == self.access_token:
+                self.access_token = None
+                self.access_token_expires = 0
 
     def call(self, verb, url, params=None, headers=None):
         """
@@ -137,14 +218,157 @@ class GoogleAPI(object):
             'prettyPrint': 'false'
         }, **(params if params else {}))
 
-        access_token = self.refresh_access_token()
-        headers = dict({
-            'Authorization': 'OAuth {}'.format(access_token)
-        }, **(headers if headers else {}))
-
-        r = requests.request(verb, url=url, params=params, headers=headers, timeout=30)
+        r = self._authorized_request(verb, url=url, params=params, headers=headers)
         return json.loads(r.text)
 
+    def call_paginated(self, verb, url, params=None, headers=None, items_key=None, max_retries=5):
+        """
+        Generator of all pages of paginated list, next page is requested only when it's needed (follows nextPageToken).
+        Raises exception if call fails.
+
+        items_key : string
+            If set, yields items of pages (page[items_key]) instead of whole pages. Example: 'messages'
+        max_retries : int
+            Retries of call when rate limit is exceeded
+        """
+        params = dict(params if params else {})
+        while True:
+            page = self._call_with_backoff({'verb': verb, 'url': url, 'params': params, 'headers': headers},
+                                           max_retries)
+            if 'error' in page:
+                raise Exception('Call failed: {}'.format(page['error']))
+            if items_key is None:
+                yield page
+            else:
+                yield from page.get(items_key, [])
+            if not page.get('nextPageToken'):
+                break
+            params['pageToken'] = page['nextPageToken']
+
+    def call_many(self, calls, max_workers=8, max_retries=5):
+        """
+        Sends calls concurrently, at most max_workers at once.
+        When rate limit is exceeded (429 or rateLimitExceeded), all workers back off exponentially
+        and the call is retried up to max_retries times.
+
+        calls : iterable
+            Dicts with call() arguments (verb, url, params, headers)
+
+        returns : list
+            Responses of calls in the same order
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(lambda call: self._call_with_backoff(call, max_retries), calls))
+
+    def _call_with_backoff(self, call, max_retries):
+        for retry in range(max_retries + 1):
+            # wait if other call exceeded rate limit
+            sleep_time = self.rate_limit_until - time.time()
+            if sleep_time > 0:
+                time.sleep(sleep_time)
+            response = self.call(**dict({'verb': 'GET'}, **call))
+            if retry == max_retries or not self._is_rate_limit_error(response):
+                return response
+            # exponential backoff with jitter
+            backoff = min(2**retry + random.random(), self.MAX_BACKOFF)
+            self.rate_limit_until = max(self.rate_limit_until, time.time() + backoff)
+        return response
+
+    def _is_rate_limit_error(self, response):
+        error = response.get('error') if isinstance(response, dict) else None
+        if not isinstance(error, dict):
+            return False
+        if error.get('code') == 429:
+            return True
+        return any(x.get('reason') in self.RATE_LIMIT_REASONS for x in error.get('errors', []))
+
+    def call_batch(self, calls, batch_url=None, max_batch_size=None):
+        """
+        Sends many calls using google batch endpoint (multipart/mixed), up to max_batch_size calls in one request.
+        Calls in one batch request must be for the same API.
+
+        calls : list
+            List of dicts with call() arguments (verb, url, params, headers)
+        batch_url : string
+            Batch endpoint. Default is made from url of first call. Example: 'https://www.googleapis.com/batch/gmail/v1'
+        max_batch_size : int
+            Number of calls in one batch request. Default is MAX_BATCH_SIZE.
+
+        returns : list
+            Responses of calls in the same order
+        """
+        calls = list(calls)
+        if not calls:
+            return []
+        if batch_url is None:
+            api, version = urllib.parse.urlsplit(calls[0]['url']).path.strip('/').split('/')[:2]
+            batch_url = self.BATCH_URL.format(api=api, version=version)
+        max_batch_size = max_batch_size if max_batch_size else self.MAX_BATCH_SIZE
+
+        results = []
+        for i in range(0, len(calls), max_batch_size):
+            results.extend(self._call_batch(calls[i:i + max_batch_size], batch_url))
+        return results
+
+    def _call_batch(self, calls, batch_url):
+        boundary = 'batch_{}'.format(os.urandom(12).hex())
+        parts = []
+        for i, call in enumerate(calls):
+            url = urllib.parse.urlsplit(call['url'])
+            params = dict({
+                'prettyPrint': 'false'
+            }, **(call.get('params') or {}))
+            query = '&'.join(x for x in [url.query, urllib.parse.urlencode(params, doseq=True)] if x)
+            lines = [
+                '--{}'.format(boundary),
+                'Content-Type: application/http',
+                'Content-ID: <item-{}>'.format(i),
+                '',
+                '{} {}?{} HTTP/1.1'.format(call.get('verb', 'GET'), url.path, query),
+            ]
+            lines.extend('{}: {}'.format(key, value) for key, value in (call.get('headers') or {}).items())
+            lines.append('')
+            parts.append('\r\n'.join(lines))
+        body = '\r\n'.join(parts) + '\r\n--{}--\r\n'.format(boundary)
+
+        r = self._authorized_request('POST', url=batch_url, data=body.encode('utf-8'), headers={
+            'Content-Type': 'multipart/mixed; boundary={}'.format(boundary)
+        })
+        responses = self._parse_batch_response(r)
+        return [responses.get(str(i)) for i in range(len(calls))]
+
+    @staticmethod
+    def _parse_batch_response(r):
+        """ returns : {content_id: decoded json} """
+        match = re.search(r'boundary="?([^";]+)"?', r.headers.get('Content-Type', ''))
+        if match is None:
+            raise Exception('Batch request failed ({}): {}'.format(r.status_code, r.text))
+        responses = {}
+        for part in r.text.split('--{}'.format(match.group(1))):
+            part = part.replace('\r\n', '\n').strip()
+            if not part or part == '--':
+                continue
+            part_headers, _, http_response = part.partition('\n\n')
+            content_id = re.search(r'Content-ID:\s*<response-item-(\d+)>', part_headers, re.IGNORECASE)
+            if content_id is None:
+                continue
+            _, _, body = http_response.partition('\n\n')  # skip status line and headers
+            responses[content_id.group(1)] = json.loads(body) if body.strip() else {}
+        return responses
+
+    def _authorized_request(self, verb, url, headers=None, **kwargs):
+        """ Sends request with cached access token, on 401 refreshes token and retries once """
+        for retry in range(2):
+            access_token = self.get_access_token()
+            request_headers = dict({
+                'Authorization': 'OAuth {}'.format(access_token)
+            }, **(headers if headers else {}))
+            r = self.session.request(verb, url=url, headers=request_headers, timeout=30, **kwargs)
+            if r.status_code != 401:
+                break
+            self.invalidate_access_token(access_token)
+        return r
+
 
 if __name__ == "__main__":
     api = GoogleAPI()
@@ -2,30 +2,231 @@
 # -*- coding: utf-8 -*-
 
 import os
+import mmap
+import json
 import hashlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
 
 import logging
 logger = logging.getLogger(__name__)
 
+HASH_BUFFER_SIZE = 1024 * 1024
+
+
+def new_hasher(algorithm):
+    """
+    Returns new hasher object.
+    algorithm : str
+        Any of hashlib.algorithms_available (sha1, sha256, md5, blake2b, ...)
+        or xxh32, xxh64, xxh3_64, xxh3_128 if xxhash is installed
+    """
+    if algorithm.startswith('xxh'):
+        if xxhash is None:
+            raise Exception(f'Hash algorithm "{algorithm}" requires xxhash (python -m pip install xxhash)')
+        return getattr(xxhash, algorithm)()
+    return hashlib.new(algorithm)
+
 
 def get_sha1_hash(filepath):
     """
     Returns sha1 hash of file.
     """
-    afile = open(filepath, 'rb')
-    filehash = get_sha1_hash_from_stream(afile)
-    afile.close()
-
-    return filehash
+    return get_hashes(filepath, ['sha1'])['sha1']
 
 
 def get_sha1_hash_from_stream(stream):
     """
     Returns sha1 hash of stream.
     """
+    return get_hashes_from_stream(stream, ['sha1'])['sha1']
+
+
+def get_hashes(filepath, algorithms=('sha1',), buffer_size=HASH_BUFFER_SIZE):
+    """
+    Returns {algorithm: hexdigest} of file, all hashes are computed in one pass.
+    """
+    with open(filepath, 'rb', buffering=0) as f:
+        return get_hashes_from_stream(f, algorithms, buffer_size)
+
+
+def get_hashes_from_stream(stream, algorithms=('sha1',), buffer_size=HASH_BUFFER_SIZE):
+    """
+    Returns {algorithm: hexdigest} of whole stream, all hashes are computed in one pass.
+    Stream is read in blocks of buffer_size into one reused buffer, so memory use doesn't depend on stream size.
+    In-memory streams (BytesIO, BinaryDataStream) and mmaps are hashed without copying.
+    """
+    if isinstance(stream, mmap.mmap):
+        return get_hashes_from_buffer(stream, algorithms, buffer_size)
+    if hasattr(stream, 'getbuffer'):
+        with stream.getbuffer() as view:
+            return get_hashes_from_buffer(view, algorithms, buffer_size)
+
     stream.seek(0, os.SEEK_SET)
-    hasher = hashlib.sha1()
-    hasher.update(stream.read())
-    filehash = hasher.hexdigest()
+    hashers = [new_hasher(x) for x in algorithms]
+    if hasattr(stream, 'readinto'):
+        buffer = bytearray(buffer_size)
+        with memoryview(buffer) as view:
+            while True:
+                length = stream.readinto(view)
+                if not length:
+                    break
+                for hasher in hashers:
+                    hasher.update(view[:length])
+    else:
+        for chunk in iter(lambda: stream.read(buffer_size), b''):
+            for hasher in hashers:
+                hasher.update(chunk)
+
+    return {algorithm: hasher.hexdigest() for algorithm, hasher in zip(algorithms, hashers)}
+
+
+def get_hashes_from_buffer(buffer, algorithms=('sha1',), buffer_size=HASH_BUFFER_SIZE):
+    """
+    Returns {algorithm: hexdigest} of bytes-like object (bytes, bytearray, memoryview, mmap).
+    All hashers process the same block while it's still in CPU cache.
+    """
+    hashers = [new_hasher(x) for x in algorithms]
+    with memoryview(buffer) as view:
+        for offset in range(0, len(view), buffer_size):
+            block = view[offset:offset + buffer_size]
+            for hasher in hashers:
+                hasher.update(block)
+
+    return {algorithm: hasher.hexdigest() for algorithm, hasher in zip(algorithms, hashers)}
+
+
+class HashCache(object):
+    """
+    Persistent cache of file hashes keyed by (path, size, mtime_ns, inode).
+    File is re-hashed only when any of these values changes.
+    """
+
+    def __init__(self, cache_path=None):
+        """
+        cache_path : str
+            JSON file where cache is stored. If None, cache is kept only in memory.
+        """
+        self.cache_path = cache_path
+        self.entries = {}  # path: [size, mtime_ns, inode, {algorithm: digest}]
+        self.modified = False
+        if cache_path and os.path.exists(cache_path):
+            with open(cache_path, 'r') as f:
+                self.entries = json.load(f)
+
+    @staticmethod
+    def _get_key(stat):
+        return [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+
+    def get(self, path, stat, algorithm):
+        """ Returns cached digest or None if file changed or isn't cached """
+        entry = self.entries.get(path)
+        if entry is None or entry[:3] != self._get_key(stat):
+            return None
+        return entry[3].get(algorithm)
+
+    def set(self, path, stat, algorithm, digest):
+        entry = self.entries.get(path)
+        if entry is None or entry[:3] != self._get_key(stat):
+            entry = self.entries[path] = self._get_key(stat) + [{}]
+        entry[3][algorithm] = digest
+        self.modified = True
+
+    def prune(self, root, seen_paths):
+        """ Removes entries of files under root that are not in seen_paths (deleted files) """
+        prefix = os.path.join(root, '')
+        for path in [x for x in self.entries if x.startswith(prefix) and x not in seen_paths]:
+            del self.entries[path]
+            self.modified = True
+
+    def save(self):
+        """ Atomically writes cache to cache_path if it was modified """
+        if not self.cache_path or not self.modified:
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.cache_path)))
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.cache_path)
+        self.modified = False
+
+
+def _hash_file(path, algorithm):
+    return get_hashes(path, [algorithm])[algorithm]
+
+
+def _scan_files(dir_path):
+    """ Yields (path, stat) of all files in directory tree, doesn't follow symlinks to directories """
+    with os.scandir(dir_path) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _scan_files(entry.path)
+            elif entry.is_file():
+                yield entry.path, entry.stat()
+
+
+def hash_tree(root, algorithm='sha1', cache=None, workers=None, use_processes=False):
+    """
+    Returns {relative path: digest} of all files in directory tree, relative paths use '/' separator.
+    Files are hashed concurrently, unchanged files are taken from cache.
+
+    cache : HashCache
+        Cache of hashes, it's updated and saved
+    workers : int
+        Number of threads or processes, default is number of CPUs
+    use_processes : bool
+        Hash in process pool instead of thread pool. Threads are usually enough, hashlib releases GIL.
+    """
+    root = os.path.abspath(root)
+    cache = cache if cache is not None else HashCache()
+    hashes = {}
+    to_hash = []  # (path, stat)
+    for path, stat in _scan_files(root):
+        digest = cache.get(path, stat, algorithm)
+        if digest is None:
+            to_hash.append((path, stat))
+        else:
+            hashes[path] = digest
+
+    if to_hash:
+        logger.debug(f'Hashing {len(to_hash)} files, {len(hashes)} taken from cache')
+        executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        with executor_class(max_workers=workers or os.cpu_count()) as executor:
+            paths = [path for path, stat in to_hash]
+            digests = executor.map(_hash_file, paths, [algorithm] * len(paths), chunksize=64)
+            for (path, stat), digest in zip(to_hash, digests):
+                cache.set(path, stat, algorithm, digest)
+                hashes[path] = digest
+
+    cache.prune(root, hashes)
+    cache.save()
+    return {os.path.relpath(path, root).replace(os.sep, '/'): digest for path, digest in hashes.items()}
+
+
+def get_tree_digest(file_hashes, algorithm='sha1'):
+    """
+    Returns Merkle-style digest of directory tree from {relative path: digest} (output of hash_tree()).
+    Digest of directory is hash of its sorted entries (type, name and digest of entry),
+    so equal subtrees have equal digests and any change propagates up to the root.
+    """
+    tree = {}
+    for path, digest in file_hashes.items():
+        node = tree
+        parts = path.split('/')
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        node[parts[-1]] = digest
+
+    def get_digest(node):
+        hasher = new_hasher(algorithm)
+        for name in sorted(node):
+            if isinstance(node[name], dict):
+                hasher.update(b'd ' + name.encode('utf-8') + b'\0' + bytes.fromhex(get_digest(node[name])))
+            else:
+                hasher.update(b'f ' + name.encode('utf-8') + b'\0' + bytes.fromhex(node[name]))
+        return hasher.hexdigest()
 
-    return filehash
+    return get_digest(tree)
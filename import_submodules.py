@@ -1,25 +1,101 @@
 #!/usr/bin/env python3
 # coding: utf-8
 
+import sys
+import time
 import importlib
+import importlib.util
 import pkgutil
 
+import logging
+logger = logging.getLogger(__name__)
 
-def import_submodules(package, recursive=True):
+
+def discover_submodules(package, recursive=True):
+    """
+    Returns names of all submodules of a package without importing them, subpackages are found
+    with finders of their parent packages. Packages are always before their submodules.
+
+    :param package: package (name or actual module)
+    :param recursive: include submodules of subpackages
+    :type package: str | module
+    :rtype: list[str]
+    """
+    return [name for name, spec in _discover_specs(package, recursive)]
+
+
+def _discover_specs(package, recursive=True):
+    """
+    Same as discover_submodules(), but returns list of tuples (name, spec), spec can be None if finder
+    of parent package doesn't find it. Specs are used by import_lazy(), finding them by name
+    with importlib.util.find_spec() would load lazy parent packages.
+    """
+    if isinstance(package, str):
+        package = importlib.import_module(package)
+    results = []
+
+    def walk(path, prefix):
+        for module_info in pkgutil.iter_modules(path, prefix):
+            spec = module_info.module_finder.find_spec(module_info.name)
+            results.append((module_info.name, spec))
+            if recursive and module_info.ispkg and spec is not None and spec.submodule_search_locations:
+                walk(spec.submodule_search_locations, module_info.name + '.')
+
+    walk(package.__path__, package.__name__ + '.')
+    return results
+
+
+def import_submodules(package, recursive=True, lazy=False, timings=None):
     """
     Import all submodules of a module, recursively, including subpackages
 
     :param package: package (name or actual module)
     :param recursive:
+    :param lazy: if True, modules are loaded on first attribute access (importlib.util.LazyLoader)
+    :param timings: dict that is filled with import time of modules in seconds {name: seconds},
+                    time of module includes time of modules it imports. Not filled for lazy modules.
     :type package: str | module
     :rtype: dict[str, types.ModuleType]
     """
-    if isinstance(package, str):
-        package = importlib.import_module(package)
     results = {}
-    for loader, name, is_pkg in pkgutil.walk_packages(package.__path__):
-        full_name = package.__name__ + '.' + name
-        results[full_name] = importlib.import_module(full_name)
-        if recursive and is_pkg:
-            results.update(import_submodules(full_name))
+    for name, spec in _discover_specs(package, recursive=recursive):
+        if lazy:
+            results[name] = import_lazy(name, spec)
+            continue
+        start_time = time.perf_counter()
+        results[name] = importlib.import_module(name)
+        seconds = time.perf_counter() - start_time
+        if timings is not None:
+            timings[name] = seconds
+        logger.debug(f'Imported {name} in {seconds * 1000:.1f} ms')
     return results
+
+
+def import_lazy(name, spec=None):
+    """
+    Returns module that is loaded on first attribute access. Parent packages that are not imported yet
+    are imported immediately, lazy parents are not loaded. Already imported module is returned as is.
+
+    :param spec: module spec, e.g. found by finder of parent package. If None, it's found by name,
+                 which loads lazy parent packages.
+    :type name: str
+    :type spec: importlib.machinery.ModuleSpec | None
+    :rtype: types.ModuleType
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    if spec is None:
+        spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f'No module named {name!r}', name=name)
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    # same as regular import, make module available as attribute of parent package
+    parent_name, _, child_name = name.rpartition('.')
+    if parent_name:
+        # setting attribute doesn't load lazy parent, it's kept when parent is loaded
+        parent = sys.modules.get(parent_name) or importlib.import_module(parent_name)
+        setattr(parent, child_name, module)
+    return module
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import pickle
+import gc
+
+import sys, os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from attrdict import AttrDict, Record, get_record_class, to_record, to_records, make_records
+
+
+class AttrDictTest(unittest.TestCase):
+
+    def test_attrdict(self):
+        data = AttrDict({'bar': 1})
+        self.assertEqual(data.bar, data['bar'])
+        data.baz = 2
+        self.assertEqual(data['baz'], 2)
+
+    def test_record(self):
+        record = to_record({'id': 1, 'name': 'a', 'self': 's', 'values': 'v'})
+        self.assertIsInstance(record, Record)
+        self.assertFalse(hasattr(record, '__dict__'))
+        self.assertEqual(record.name, 'a')
+        self.assertEqual(record['self'], 's')
+        self.assertEqual(record.values, 'v')  # shadowed method
+        record['name'] = 'b'
+        record.id = 2
+        self.assertEqual(dict(record), {'id': 2, 'name': 'b', 'self': 's', 'values': 'v'})
+        self.assertEqual(record, {'id': 2, 'name': 'b', 'self': 's', 'values': 'v'})
+        self.assertEqual(pickle.loads(pickle.dumps(record)), record)
+        self.assertEqual(record.get('missing', 0), 0)
+        self.assertNotIn('missing', record)
+        with self.assertRaises(KeyError):
+            record['missing']
+        with self.assertRaises(AttributeError):
+            record.missing = 1
+        for keys in [['class'], ['_private'], ['with space'], [1], ['a', 'a']]:
+            with self.assertRaises(ValueError):
+                get_record_class(keys)
+
+    def test_bulk(self):
+        dicts = [{'id': 1, 'name': 'a'}, {'id': 2, 'name': 'b'}, {'name': 'c', 'id': 3}, {}]
+        records = to_records(dicts)
+        self.assertEqual(records, dicts)
+        self.assertIs(type(records[0]), type(records[1]))
+        self.assertIsNot(type(records[0]), type(records[2]))
+        self.assertIs(type(records[0]), get_record_class(['id', 'name']))
+
+        records = make_records(['id', 'name'], [(1, 'a'), (2, 'b')])
+        self.assertEqual(records, dicts[:2])
+        # no reference cycle, unlike AttrDict
+        self.assertNotIn(records[0], gc.get_referents(records[0]))
+        attrdict = AttrDict(dicts[0])
+        self.assertIn(attrdict, gc.get_referents(attrdict))
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import pickle
+
+import sys, os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from caseinsensitivedict import CaseInsensitiveDict
+
+
+class CaseInsensitiveDictTest(unittest.TestCase):
+
+    def test_access(self):
+        cid = CaseInsensitiveDict({'Accept': 'json'}, Host='a.com')
+        cid['aCCEPT'] = 'xml'
+        self.assertEqual(cid['ACCEPT'], 'xml')
+        self.assertEqual(list(cid), ['aCCEPT', 'Host'])
+        self.assertIn('host', cid)
+        self.assertNotIn('missing', cid)
+        self.assertEqual(cid.get('HOST'), 'a.com')
+        self.assertIsNone(cid.get('missing'))
+        self.assertEqual(cid.get('missing', 1), 1)
+        with self.assertRaises(KeyError):
+            cid['missing']
+        del cid['HoSt']
+        self.assertEqual(len(cid), 1)
+        self.assertEqual(dict(cid.lower_items()), {'accept': 'xml'})
+        self.assertEqual(CaseInsensitiveDict({'Straße': 1})['STRASSE'], 1)
+        self.assertEqual(pickle.loads(pickle.dumps(cid)), cid)
+
+    def test_update_copy_eq(self):
+        cid = CaseInsensitiveDict([('A', 1), ('b', 2)])
+        self.assertEqual(cid, {'a': 1, 'B': 2})
+        self.assertEqual(cid, CaseInsensitiveDict({'a': 1, 'B': 2}))
+        self.assertNotEqual(cid, {'a': 1, 'B': 3})
+        self.assertNotEqual(cid, {'a': 1, 'c': 2})
+        self.assertNotEqual(cid, {'a': 1})
+        self.assertNotEqual(cid, [('A', 1), ('b', 2)])
+
+        copy = cid.copy()
+        copy['c'] = 3
+        self.assertNotIn('C', cid)
+        cid.update(copy)
+        self.assertEqual(cid, copy)
+
+        other = CaseInsensitiveDict()
+        other.update_folded(cid.folded_items())
+        self.assertEqual(other, cid)
+        self.assertEqual(list(other), ['A', 'b', 'c'])
+
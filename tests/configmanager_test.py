@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import tempfile
+import shutil
+import time
+
+import sys, os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from configmanager import ConfigManager
+
+CONFIG_TEXT = """
+[Network]
+timeout = 2.5
+retries = 0x10
+hosts = a.com, B.com  # comment
+Debug = yes
+"""
+SCHEMA = {
+    "Network": {
+        "timeout": "float",
+        "retries": "int",
+        "hosts": "list_lower",
+        "Debug": "boolean",
+        "delay": ("float", 0.0),
+    },
+}
+
+
+class ConfigManagerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.config_path = os.path.join(self.tmp_dir, "config.ini")
+        with open(self.config_path, "w") as f:
+            f.write(CONFIG_TEXT)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_getters(self):
+        cm = ConfigManager()
+        cm.load_config(self.config_path)
+        self.assertEqual(cm.get_int("Network", "retries"), 16)
+        self.assertEqual(cm.get_list("Network", "hosts"), ["a.com", "B.com"])
+        self.assertTrue(cm.get_boolean("Network", "Debug"))
+
+    def test_snapshot(self):
+        cm = ConfigManager()
+        cm.set_schema(SCHEMA)
+        cm.load_config(self.config_path)
+        snapshot = cm.get_snapshot()
+        self.assertIs(cm.get_snapshot(), snapshot)
+        self.assertEqual(snapshot.Network.timeout, 2.5)
+        self.assertEqual(snapshot.Network.retries, 16)
+        self.assertEqual(snapshot.Network.hosts, ("a.com", "b.com"))
+        self.assertIs(snapshot.Network.Debug, True)
+        self.assertEqual(snapshot.Network.delay, 0.0)
+        with self.assertRaises(AttributeError):
+            snapshot.Network.timeout = 1
+
+        # invalidated by load
+        config_path = os.path.join(self.tmp_dir, "update.ini")
+        with open(config_path, "w") as f:
+            f.write("[Network]\ndelay = 1\nretries = many\n")
+        cm.load_config(config_path)
+        with self.assertRaisesRegex(Exception, "retries"):
+            cm.get_snapshot()
+
+        cm.clear_config()
+        with self.assertRaisesRegex(Exception, "timeout: missing"):
+            cm.get_snapshot()
+
+    def write_file(self, name, text):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+    def test_load_config(self):
+        cm = ConfigManager()
+        a_path = self.write_file("a.ini", "[DEFAULT]\nx = 1\nz = 1\n[S]\ny = 2\n")
+        b_path = self.write_file("b.ini", "[DEFAULT]\nx = 9\n")
+        missing_path = os.path.join(self.tmp_dir, "local.ini")
+
+        # defaults of later files override defaults inherited by sections of earlier files
+        cm.load_config(a_path)
+        cm.load_config([b_path, missing_path])
+        self.assertEqual(cm.get("S", "x"), "9")
+        self.assertEqual(cm.get("S", "z"), "1")
+        self.assertEqual(cm.get("S", "y"), "2")
+
+        # optional missing file doesn't break reload, it's loaded when it appears
+        self.assertTrue(cm.reload_config())
+        self.assertEqual(cm.get("S", "x"), "9")
+        self.write_file("local.ini", "[S]\nx = 5\n")
+        self.assertTrue(cm.reload_config())
+        self.assertEqual(cm.get("S", "x"), "5")
+
+        # config is replaced at once, invalid file keeps old config
+        cm.load_config(self.write_file("invalid.ini", "x = 1\n"), update=False)
+        self.assertEqual(cm.get("S", "x"), "5")
+        cm.load_config(b_path, update=False)
+        self.assertEqual(cm.sections(), [])
+        self.assertEqual(cm.loaded_paths, [b_path])
+
+    def test_snapshot_race(self):
+        cm = ConfigManager()
+        cm.set_schema(SCHEMA)
+        cm.load_config(self.config_path)
+        update_path = self.write_file("update.ini", "[Network]\ndelay = 1\n")
+
+        # config is loaded by other thread while snapshot is built
+        build_snapshot = cm.build_snapshot
+
+        def build_and_load(config):
+            snapshot = build_snapshot(config)
+            cm.load_config(update_path)
+            return snapshot
+
+        cm.build_snapshot = build_and_load
+        self.assertEqual(cm.get_snapshot().Network.delay, 0.0)
+        cm.build_snapshot = build_snapshot
+        self.assertEqual(cm.get_snapshot().Network.delay, 1.0)
+
+    def wait_for(self, condition, timeout=5):
+        end_time = time.time() + timeout
+        while not condition():
+            if time.time() > end_time:
+                self.fail("Timeout")
+            time.sleep(0.01)
+
+    def test_watch(self):
+        cm = ConfigManager()
+        cm.set_schema(SCHEMA)
+        cm.load_config(self.config_path)
+        snapshots = []
+        cm.watch(interval=0.02, on_reload=snapshots.append)
+        self.addCleanup(cm.stop_watching)
+
+        with open(self.config_path, "w") as f:
+            f.write(CONFIG_TEXT + "delay = 1.25\n")
+        self.wait_for(lambda: cm.get_snapshot().Network.delay == 1.25)
+        self.assertEqual(len(snapshots), 1)
+
+        # invalid config is not loaded
+        with open(self.config_path, "w") as f:
+            f.write(CONFIG_TEXT.replace("2.5", "slow"))
+        time.sleep(0.2)
+        self.assertEqual(cm.get_snapshot().Network.timeout, 2.5)
+        self.assertEqual(cm.get_float("Network", "timeout"), 2.5)
+
+        with open(self.config_path, "w") as f:
+            f.write(CONFIG_TEXT.replace("2.5", "7"))
+        self.wait_for(lambda: cm.get_snapshot().Network.timeout == 7)
+        self.assertEqual(cm.get_snapshot().Network.delay, 0.0)
+        self.assertEqual(len(snapshots), 2)
+
+        cm.stop_watching()
+        self.assertIsNone(cm.watch_thread)
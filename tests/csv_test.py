@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import importlib.util
+import tempfile
+import shutil
+import gzip
+import io
+
+import sys, os
+package_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+CSV_TEXT = 'id,name,price,active\n1,apple,1.5,true\n2,"pear, green",,no\n3,plum,0.25,1\n'
+ROWS = [(1, 'apple', 1.5, True), (2, 'pear, green', None, False), (3, 'plum', 0.25, True)]
+package_csv = None  # loaded by setUpModule()
+SCHEMA = None
+saved_modules = {}
+
+
+def setUpModule():
+    # module can't be imported by name, it would shadow (or be shadowed by) standard csv module,
+    # which must be imported first, without package directory in sys.path ('python -m pytest' adds it)
+    global package_csv, SCHEMA
+    saved_modules.update({name: sys.modules.get(name) for name in ['csv', 'package_csv']})
+    csv_module = sys.modules.get('csv')
+    if os.path.dirname(os.path.abspath(getattr(csv_module, '__file__', '') or '.')) == package_dir:
+        sys_path = sys.path
+        sys.path = [x for x in sys.path if os.path.abspath(x or '.') != package_dir]
+        try:
+            del sys.modules['csv']
+            importlib.import_module('csv')
+        finally:
+            sys.path = sys_path
+    spec = importlib.util.spec_from_file_location('package_csv', os.path.join(package_dir, 'csv.py'))
+    package_csv = sys.modules['package_csv'] = importlib.util.module_from_spec(spec)  # worker processes need it
+    spec.loader.exec_module(package_csv)
+    SCHEMA = {'id': int, 'price': float, 'active': package_csv.parse_bool}
+
+
+def tearDownModule():
+    for name, module in saved_modules.items():
+        if module is None:
+            sys.modules.pop(name, None)
+        else:
+            sys.modules[name] = module
+    saved_modules.clear()
+
+
+class CSVTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.csv_path = os.path.join(self.tmp_dir, 'test.csv')
+        with open(self.csv_path, 'w', newline='') as f:
+            f.write(CSV_TEXT)
+        self.gz_path = os.path.join(self.tmp_dir, 'test.csv.gz')
+        with gzip.open(self.gz_path, 'wt', newline='') as f:
+            f.write(CSV_TEXT)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_read_csv(self):
+        for path in [self.csv_path, self.gz_path]:
+            rows = list(package_csv.read_csv(path))
+            self.assertEqual([x['name'] for x in rows], ['apple', 'pear, green', 'plum'])
+        self.assertEqual(package_csv.read_csv_headers(self.gz_path), ['id', 'name', 'price', 'active'])
+
+    def test_read_csv_batches(self):
+        for path in [self.csv_path, self.gz_path]:
+            batches = list(package_csv.read_csv_batches(path, batch_size=2, schema=SCHEMA))
+            self.assertEqual([len(x) for x in batches], [2, 1])
+            self.assertEqual(batches[0] + batches[1], ROWS)
+
+        batches = list(package_csv.read_csv_batches(io.StringIO(CSV_TEXT), schema=SCHEMA, columns=True))
+        self.assertEqual(batches, [{
+            'id': [1, 2, 3],
+            'name': ['apple', 'pear, green', 'plum'],
+            'price': [1.5, None, 0.25],
+            'active': [True, False, True],
+        }])
+
+        # no header row, ragged rows
+        batches = list(package_csv.read_csv_batches(io.StringIO('a;b\nc\n'), headers=['x', 'y'], delimiter=';'))
+        self.assertEqual(batches, [[('a', 'b'), ('c', '')]])
+
+        with self.assertRaises(ValueError):
+            list(package_csv.read_csv_batches(io.StringIO('a\nmaybe\n'), schema={'a': package_csv.parse_bool}))
+
+    def test_write_csv(self):
+        dicts = [{'id': 1, 'name': 'apple'}, {'id': 2}, {'name': 'pear, green', 'id': 3}]
+        path = os.path.join(self.tmp_dir, 'out.csv')
+        package_csv.write_csv(path, iter(dicts))
+        self.assertEqual(list(package_csv.read_csv(path)), [
+            {'id': '1', 'name': 'apple'}, {'id': '2', 'name': ''}, {'id': '3', 'name': 'pear, green'}
+        ])
+
+        package_csv.write_csv(path, [])
+        self.assertEqual(list(package_csv.read_csv(path)), [])
+
+        # keys not in headers
+        dicts = [{'id': 1, 'name': 'apple'}, {'id': 2, 'price': 1.5}]
+        with self.assertRaises(ValueError):
+            package_csv.write_csv(path, dicts)
+        package_csv.write_csv(path, dicts, extrasaction='ignore')
+        self.assertEqual(list(package_csv.read_csv(path)), [{'id': '1', 'name': 'apple'}, {'id': '2', 'name': ''}])
+
+    def test_write_csv_rows(self):
+        rows = [(i, f'name {i}', i / 4) for i in range(1000)]
+        expected = [tuple(str(x) for x in row) for row in rows]
+        for file_name, workers in [('out.csv', 0), ('out.csv.gz', 0), ('out.csv.gz', 3)]:
+            path = os.path.join(self.tmp_dir, file_name)
+            package_csv.write_csv_rows(path, (x for x in rows), ['id', 'name', 'value'], workers=workers,
+                                       batch_size=64, delimiter=';')
+            self.assertEqual(package_csv.read_csv_headers(path, delimiter=';'), ['id', 'name', 'value'])
+            batches = list(package_csv.read_csv_batches(path, delimiter=';'))
+            self.assertEqual([row for batch in batches for row in batch], expected)
+
+    def test_read_csv_parallel(self):
+        path = os.path.join(self.tmp_dir, 'big.csv')
+        rows = [(i, f'name "{i}"', i % 2 == 0) for i in range(500)]
+        package_csv.write_csv_rows(path, rows, ['id', 'name', 'even'])
+        schema = {'id': int, 'even': package_csv.parse_bool}
+
+        for chunk_size in [1, 100, 10**6]:
+            batches = list(package_csv.read_csv_parallel(path, workers=2, batch_size=64, schema=schema,
+                                                         chunk_size=chunk_size))
+            self.assertTrue(all(len(x) <= 64 for x in batches))
+            self.assertEqual([row for batch in batches for row in batch], rows)
+
+        merged = package_csv.read_csv_parallel(path, workers=2, schema=schema, merge=True, chunk_size=1000)
+        self.assertEqual(merged, {'id': list(range(500)), 'name': [x[1] for x in rows],
+                                  'even': [x[2] for x in rows]})
+
+        self.assertEqual(list(package_csv.read_csv_parallel(self.csv_path, workers=2, schema=SCHEMA)), [ROWS])
+        empty_path = os.path.join(self.tmp_dir, 'empty.csv')
+        package_csv.write_csv_rows(empty_path, [], ['a'])
+        self.assertEqual(package_csv.read_csv_parallel(empty_path, merge=True), {'a': []})
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import tempfile
+import zipfile
+import tarfile
+import shutil
+import zlib
+import gzip
+
+import sys, os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from decompressor.decompressor import Decompressor
+
+TEST_FILES = {
+    'a.txt': b'hello world',
+    'dir/b.bin': bytes(range(256)) * 64,
+    'dir/sub/c.txt': b'nested file',
+}
+
+
+class DecompressorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.zip_path = os.path.join(self.tmp_dir, 'test.zip')
+        with zipfile.ZipFile(self.zip_path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+            for path, data in TEST_FILES.items():
+                zf.writestr(path, data)
+        self.tar_path = os.path.join(self.tmp_dir, 'test.tar')
+        with tarfile.open(self.tar_path, 'w') as tf:
+            for path, data in TEST_FILES.items():
+                file_path = os.path.join(self.tmp_dir, 'src', path)
+                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                with open(file_path, 'wb') as f:
+                    f.write(data)
+                tf.add(file_path, arcname=path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def assertExtracted(self, dest, files):
+        for path in files:
+            with open(os.path.join(dest, path), 'rb') as f:
+                self.assertEqual(f.read(), TEST_FILES[path])
+
+    def test_open_detects_archive_type(self):
+        # missing and wrong extensions
+        for archive_path, new_name in [(self.zip_path, 'zip_no_ext'), (self.tar_path, 'tar_as.zip')]:
+            new_path = os.path.join(self.tmp_dir, new_name)
+            shutil.copy(archive_path, new_path)
+            self.assertTrue(Decompressor.is_supported(new_path))
+            dec = Decompressor(new_path)
+            self.assertEqual(sorted(dec.get_file_list()), sorted(TEST_FILES))
+            self.assertEqual(dec.open_file('a.txt').read(), TEST_FILES['a.txt'])
+            dec.close()
+
+        # compressed tar
+        tgz_path = os.path.join(self.tmp_dir, 'test.tar.gz')
+        with tarfile.open(tgz_path, 'w:gz') as tf:
+            tf.add(os.path.join(self.tmp_dir, 'src', 'a.txt'), arcname='a.txt')
+        dec = Decompressor(tgz_path)
+        self.assertEqual(dec.open_file('a.txt').read(), TEST_FILES['a.txt'])
+        dec.close()
+
+        # detected by compression signature
+        gz_path = os.path.join(self.tmp_dir, 'test.gz')
+        shutil.copy(tgz_path, gz_path)
+        self.assertTrue(Decompressor.is_supported(gz_path))
+
+        # not an archive
+        txt_path = os.path.join(self.tmp_dir, 'src', 'a.txt')
+        csv_gz_path = os.path.join(self.tmp_dir, 'data.csv.gz')
+        with gzip.open(csv_gz_path, 'wb') as f:
+            f.write(b'id,name\n1,apple\n')
+        for path in [txt_path, csv_gz_path]:
+            self.assertFalse(Decompressor.is_supported(path))
+            with self.assertRaisesRegex(Exception, 'not supported'):
+                Decompressor(path)
+
+    def test_open_nested(self):
+        with open(self.zip_path, 'rb') as f:
+            inner_zip = f.read()
+        with open(self.tar_path, 'rb') as f:
+            inner_tar = f.read()
+        for compression in [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED]:
+            outer_path = os.path.join(self.tmp_dir, f'outer_{compression}.zip')
+            with zipfile.ZipFile(outer_path, 'w', compression=compression) as zf:
+                zf.writestr('packs/inner.zip', inner_zip)
+                zf.writestr('packs/inner.tar', inner_tar)
+            outer = Decompressor(outer_path)
+            for nested_path in ['packs/inner.zip', 'packs/inner.tar']:
+                nested = outer.open_nested(nested_path)
+                self.assertEqual(sorted(nested.get_file_list()), sorted(TEST_FILES))
+                for path, data in TEST_FILES.items():
+                    self.assertEqual(nested.open_file(path).read(), data)
+                nested.close()
+            outer.close()
+
+    def test_stat(self):
+        dec = Decompressor(self.zip_path)
+        stat = dec.stat('dir/b.bin')
+        dec.close()
+        self.assertEqual(stat.size, len(TEST_FILES['dir/b.bin']))
+        self.assertLess(stat.compressed_size, stat.size)
+        self.assertEqual(stat.crc, zlib.crc32(TEST_FILES['dir/b.bin']))
+
+        dec = Decompressor(self.tar_path)
+        stat = dec.stat('dir/b.bin')
+        dec.close()
+        self.assertEqual(stat.size, len(TEST_FILES['dir/b.bin']))
+        self.assertIsNone(stat.crc)
+
+    def test_verify(self):
+        for archive_path in [self.zip_path, self.tar_path]:
+            for workers in [1, 2]:
+                dec = Decompressor(archive_path)
+                self.assertEqual(dec.verify(workers=workers), {})
+                dec.close()
+
+        # corrupt data of stored file
+        zip_path = os.path.join(self.tmp_dir, 'corrupted.zip')
+        with zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_STORED) as zf:
+            for path, data in TEST_FILES.items():
+                zf.writestr(path, data)
+        with open(zip_path, 'r+b') as f:
+            data = f.read()
+            f.seek(data.index(TEST_FILES['dir/sub/c.txt']))
+            f.write(b'N')
+        for workers in [1, 2]:
+            dec = Decompressor(zip_path)
+            self.assertEqual(list(dec.verify(workers=workers)), ['dir/sub/c.txt'])
+            dec.close()
+
+    def test_extract_all(self):
+        for archive_path in [self.zip_path, self.tar_path]:
+            for workers in [1, 2]:
+                dest = os.path.join(self.tmp_dir, f'out_{os.path.basename(archive_path)}_{workers}')
+                dec = Decompressor(archive_path)
+                stats = dec.extract_all(dest, workers=workers)
+                dec.close()
+                self.assertEqual(stats['files'], len(TEST_FILES))
+                self.assertEqual(stats['bytes'], sum(len(x) for x in TEST_FILES.values()))
+                self.assertExtracted(dest, TEST_FILES)
+
+    def test_extract_all_compressed_tar(self):
+        tgz_path = os.path.join(self.tmp_dir, 'test.tgz')
+        with tarfile.open(tgz_path, 'w:gz') as tf:
+            tf.add(os.path.join(self.tmp_dir, 'src'), arcname='')
+        dest = os.path.join(self.tmp_dir, 'out')
+        dec = Decompressor(tgz_path)
+        # workers would decompress whole archive each, it's processed serially
+        self.assertFalse(dec.opened_archive.can_extract_parallel())
+        stats = dec.extract_all(dest, workers=2)
+        self.assertEqual(dec.verify(workers=2), {})
+        dec.close()
+        self.assertEqual(stats['files'], len(TEST_FILES))
+        self.assertExtracted(dest, TEST_FILES)
+
+        dec = Decompressor(self.tar_path)
+        self.assertTrue(dec.opened_archive.can_extract_parallel())
+        dec.close()
+
+    def test_extract_all_members(self):
+        dest = os.path.join(self.tmp_dir, 'out')
+        dec = Decompressor(self.zip_path)
+        stats = dec.extract_all(dest, members=['dir/sub/c.txt'], workers=2)
+        dec.close()
+        self.assertEqual(stats['files'], 1)
+        self.assertExtracted(dest, ['dir/sub/c.txt'])
+        self.assertFalse(os.path.exists(os.path.join(dest, 'a.txt')))
+
+    def test_extract_all_outside_dest(self):
+        zip_path = os.path.join(self.tmp_dir, 'evil.zip')
+        with zipfile.ZipFile(zip_path, 'w') as zf:
+            zf.writestr('../evil.txt', b'evil')
+        dec = Decompressor(zip_path)
+        with self.assertRaises(Exception):
+            dec.extract_all(os.path.join(self.tmp_dir, 'out'), workers=1)
+        dec.close()
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_dir, 'evil.txt')))
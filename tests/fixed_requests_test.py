@@ -2,10 +2,105 @@
 # -*- coding: utf-8 -*-
 
 import unittest
+from unittest import mock
+import threading
+import http.server
+import tempfile
+import shutil
+import hashlib
+import urllib.parse
 
 import sys, os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
-from fixed_requests import FixedRequests
+from fixed_requests import FixedRequests, HostRateLimiter, Histogram, AsyncFixedRequests, aiohttp
+if aiohttp is not None:
+    from aiohttp import web
+
+
+def mock_response(status_code=200, **kwargs):
+    return mock.Mock(status_code=status_code, headers={}, **kwargs)
+
+
+FILE_DATA = bytes(range(256)) * 4096
+
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    hits = 0
+    break_transfers = 0
+
+    def do_GET(self):
+        StubHandler.hits += 1
+        if self.path.startswith('/file'):
+            return self.send_file()
+        if self.path.startswith('/unavailable'):
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = b'ok'
+        if self.path.startswith('/vary'):
+            body = self.headers.get('Accept-Language', '').encode()
+        if self.path.startswith('/etag') and self.headers.get('If-None-Match') == '"v1"':
+            self.send_response(304)
+            self.send_header('ETag', '"v1"')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Set-Cookie', 'CAKE=IS A LIE')
+        if self.path.startswith('/etag'):
+            self.send_header('ETag', '"v1"')
+            self.send_header('Cache-Control', 'no-cache')
+        elif self.path.startswith('/fresh'):
+            self.send_header('Cache-Control', 'max-age=60')
+        elif self.path.startswith('/vary'):
+            self.send_header('Cache-Control', 'max-age=60')
+            self.send_header('Vary', 'Accept-Language')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_file(self):
+        # supports Range requests, can break connection in middle of transfer
+        start, end = 0, len(FILE_DATA)
+        range_header = self.headers.get('Range')
+        if range_header and 'norange' not in self.path:
+            first, last = range_header.replace('bytes=', '').split('-')
+            start, end = int(first), (int(last) + 1 if last else len(FILE_DATA))
+            if start >= len(FILE_DATA):
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{len(FILE_DATA)}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end - 1}/{len(FILE_DATA)}')
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', str(end - start))
+        self.end_headers()
+        if StubHandler.break_transfers > 0:
+            StubHandler.break_transfers -= 1
+            self.wfile.write(FILE_DATA[start:start + (end - start) // 2])
+            self.close_connection = True
+            return
+        self.wfile.write(FILE_DATA[start:end])
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(object):
+
+    def __enter__(self):
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.server.shutdown()
+        self.server.server_close()
 
 class FixedRequestsTest(unittest.TestCase):
 
@@ -51,3 +146,318 @@ class FixedRequestsTest(unittest.TestCase):
         fr.set_timeout(timeout1)
         get = fr.get_timeout()
         self.assertEqual(get, timeout1)
+
+    def test_host_rate_limiter(self):
+        limiter = HostRateLimiter(delay=10)
+        self.assertEqual(limiter.reserve('a.com'), 0)
+        self.assertEqual(limiter.reserve('b.com'), 0)  # other hosts are not delayed
+        self.assertAlmostEqual(limiter.reserve('a.com'), 10, places=1)
+        self.assertAlmostEqual(limiter.reserve('a.com'), 20, places=1)
+
+        limiter = HostRateLimiter(delay=0)
+        self.assertEqual(limiter.reserve('a.com'), 0)
+        limiter.penalize('a.com', 5)
+        self.assertAlmostEqual(limiter.reserve('a.com'), 5, places=1)
+        self.assertEqual(limiter.reserve('b.com'), 0)
+
+    def test_request_delay(self):
+        fr = FixedRequests()
+        fr.request_delay = 10  # direct assignment is applied to rate limiter
+        self.assertEqual(fr.rate_limiter.get_delay('a.com'), 10)
+        fr.set_request_delay(5)
+        self.assertEqual(fr.request_delay, 5)
+        self.assertEqual(fr.rate_limiter.get_delay('a.com'), 5)
+
+    def test_map(self):
+        fr = FixedRequests()
+        fr.requests_session = mock.Mock()
+        fr.requests_session.get.side_effect = lambda url, **kwargs: mock_response(url=url)
+        urls = [f'http://host{i % 3}.com/{i}' for i in range(10)]
+        responses = fr.get_many(urls, max_workers=4)
+        self.assertEqual([r.url for r in responses], urls)
+
+        # failed requests
+        fr.max_errors = 1
+        fr.error_sleep_time = 0
+        fr.requests_session.get.side_effect = lambda url, **kwargs: mock_response(503 if 'fail' in url else 200)
+        responses = fr.get_many(['http://a.com/ok', 'http://a.com/fail'], return_exceptions=True)
+        self.assertEqual(responses[0].status_code, 200)
+        self.assertIsInstance(responses[1], Exception)
+        with self.assertRaises(Exception):
+            fr.get_many(['http://a.com/ok', 'http://a.com/fail'])
+
+    def test_adaptive_throttle(self):
+        limiter = HostRateLimiter(delay=1, adaptive=True, max_delay=10)
+        self.assertEqual(limiter.get_delay('a.com'), 1)
+        for _ in range(20):
+            limiter.record_error('a.com')
+        self.assertEqual(limiter.get_delay('a.com'), 10)
+        self.assertEqual(limiter.get_delay('b.com'), 1)
+        for _ in range(200):
+            limiter.record_success('a.com')
+        self.assertEqual(limiter.get_delay('a.com'), 1)
+
+    def test_retry_after(self):
+        self.assertEqual(FixedRequests._parse_retry_after('120'), 120)
+        self.assertIsNone(FixedRequests._parse_retry_after(None))
+        self.assertIsNone(FixedRequests._parse_retry_after('soon'))
+        self.assertEqual(FixedRequests._parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT'), 0)
+
+        fr = FixedRequests()
+        fr.error_sleep_time = 0
+        fr.requests_session = mock.Mock()
+        fr.requests_session.get.side_effect = [
+            mock.Mock(status_code=429, headers={'Retry-After': '7'}),
+            mock_response(200),
+        ]
+        with mock.patch('time.sleep') as sleep:
+            r = fr.get(url='http://a.com/')
+        self.assertEqual(r.status_code, 200)
+        self.assertAlmostEqual(sleep.call_args_list[-1][0][0], 7, places=1)
+        self.assertGreater(fr.last_request_time, 0)
+
+    def test_connection_pool(self):
+        fr = FixedRequests(pool_maxsize=4, pool_block=True)
+        adapter = fr.requests_session.get_adapter('https://example.com')
+        self.assertEqual(adapter._pool_maxsize, 4)
+        self.assertTrue(adapter._pool_block)
+
+        with StubServer() as server:
+            for i in range(3):
+                fr.get(url=server.url + f'/{i}')
+            stats = fr.get_connection_stats()
+            self.assertEqual(stats['connections'], 1)
+            self.assertEqual(stats['requests'], 3)
+            self.assertEqual(stats['reused'], 2)
+
+    def test_no_cookies(self):
+        with StubServer() as server:
+            fr = FixedRequests(use_cookies=True)
+            fr.get(url=server.url)
+            self.assertEqual(fr.get_cookies(), {'CAKE': 'IS A LIE'})
+
+            fr = FixedRequests(use_cookies=False)
+            fr.get(url=server.url)
+            self.assertEqual(fr.get_cookies(), {})
+            fr.set_cookies({'USER': 'SET'})
+            fr.get(url=server.url)
+            self.assertEqual(fr.get_cookies(), {'USER': 'SET'})
+
+    def test_response_cache(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        with StubServer() as server:
+            fr = FixedRequests(use_cookies=False)  # requests with cookies are not cached
+            fr.enable_cache(max_entries=1, cache_dir=cache_dir)
+            StubHandler.hits = 0
+
+            # fresh response is not requested again
+            r1 = fr.get(url=server.url + '/fresh', params={'a': 1})
+            r2 = fr.get(url=server.url + '/fresh', params={'a': 1})
+            self.assertIs(r1, r2)
+            self.assertEqual(StubHandler.hits, 1)
+
+            # stale response is revalidated
+            r1 = fr.get(url=server.url + '/etag')
+            r2 = fr.get(url=server.url + '/etag')
+            self.assertEqual(StubHandler.hits, 3)
+            self.assertEqual(r2.status_code, 200)
+            self.assertEqual(r2.text, 'ok')
+
+            # evicted from memory, loaded from disk
+            r3 = fr.get(url=server.url + '/fresh', params={'a': 1})
+            self.assertEqual(r3.text, 'ok')
+            self.assertEqual(StubHandler.hits, 3)
+
+            stats = fr.get_cache_stats()
+            self.assertEqual(stats['hits'], 2)
+            self.assertEqual(stats['revalidated'], 1)
+            self.assertEqual(stats['misses'], 2)
+
+    def test_response_cache_evicted(self):
+        with StubServer() as server:
+            fr = FixedRequests(use_cookies=False)
+            fr.enable_cache()
+            fr.get(url=server.url + '/etag')
+
+            # entry is evicted (e.g. by other thread) while it's being revalidated
+            session_get = fr.requests_session.get
+
+            def get(**kwargs):
+                fr.response_cache.entries.clear()
+                return session_get(**kwargs)
+
+            fr.requests_session.get = get
+            r = fr.get(url=server.url + '/etag')
+            self.assertEqual(r.status_code, 200)
+            self.assertEqual(r.text, 'ok')
+            self.assertEqual(fr.get_cache_stats()['revalidated'], 1)
+
+    def test_response_cache_private(self):
+        with StubServer() as server:
+            fr = FixedRequests(use_cookies=False)
+            fr.enable_cache()
+            StubHandler.hits = 0
+
+            # responses are reused only for the same values of headers listed in Vary
+            url = server.url + '/vary'
+            self.assertEqual(fr.get(url=url, headers={'Accept-Language': 'en'}).text, 'en')
+            self.assertEqual(fr.get(url=url, headers={'Accept-Language': 'de'}).text, 'de')
+            self.assertEqual(fr.get(url=url, headers={'Accept-Language': 'de'}).text, 'de')
+            self.assertEqual(StubHandler.hits, 2)
+
+            # requests with credentials are not cached
+            url = server.url + '/fresh'
+            fr.get(url=url, headers={'Authorization': 'Bearer secret'})
+            fr.get(url=url, headers={'Authorization': 'Bearer secret'})
+            self.assertEqual(StubHandler.hits, 4)
+            fr.set_cookies({'session': 'secret'})
+            fr.get(url=url)
+            fr.get(url=url)
+            self.assertEqual(StubHandler.hits, 6)
+            self.assertEqual(fr.get_cache_stats()['stored'], 2)  # both variants of /vary
+
+    def test_download(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        dest = os.path.join(tmp_dir, 'file.bin')
+        file_hash = hashlib.sha256(FILE_DATA).hexdigest()
+        with StubServer() as server:
+            fr = FixedRequests()
+            fr.error_sleep_time = 0
+            for path, segments, break_transfers in [('/file', 1, 0), ('/file', 1, 2), ('/file', 4, 3),
+                                                    ('/file/norange', 4, 0)]:
+                StubHandler.break_transfers = break_transfers
+                size = fr.download(server.url + path, dest, segments=segments, chunk_size=4096,
+                                   expected_size=len(FILE_DATA), expected_hash=file_hash)
+                self.assertEqual(size, len(FILE_DATA))
+                with open(dest, 'rb') as f:
+                    self.assertEqual(f.read(), FILE_DATA)
+                self.assertFalse(os.path.exists(dest + '.part'))
+
+            # resume from previous partial download
+            with open(dest + '.part', 'wb') as f:
+                f.write(FILE_DATA[:1000])
+            fr.download(server.url + '/file', dest, expected_hash=file_hash)
+            with open(dest, 'rb') as f:
+                self.assertEqual(f.read(), FILE_DATA)
+
+            # server ignores range of leftover partial download, file is downloaded from beginning
+            with open(dest + '.part', 'wb') as f:
+                f.write(b'x' * (len(FILE_DATA) + 1000))
+            fr.download(server.url + '/file/norange', dest, expected_hash=file_hash)
+            with open(dest, 'rb') as f:
+                self.assertEqual(f.read(), FILE_DATA)
+            self.assertFalse(os.path.exists(dest + '.part'))
+
+            with self.assertRaises(Exception):
+                fr.download(server.url + '/file', dest, expected_hash='00')
+            self.assertFalse(os.path.exists(dest + '.part'))
+
+    def test_metrics(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        events = []
+        with StubServer() as server:
+            fr = FixedRequests(max_errors=2)
+            fr.error_sleep_time = 0
+            fr.enable_metrics(callback=events.append)
+            fr.set_request_delay(0.05)
+            host = urllib.parse.urlparse(server.url).netloc
+
+            fr.get(url=server.url + '/a')
+            fr.get(url=server.url + '/b')
+            with mock.patch.object(fr.rate_limiter, 'penalize'), self.assertRaises(Exception):
+                fr.get(url=server.url + '/unavailable')
+            fr.download(server.url + '/file', os.path.join(tmp_dir, 'file.bin'))
+
+            summary = fr.get_metrics_summary()[host]
+            self.assertEqual(summary['requests'], 5)
+            self.assertEqual(summary['retries'], {503: 2})
+            self.assertEqual(summary['bytes_received'], 2 * len(b'ok') + len(FILE_DATA))
+            self.assertEqual(summary['connect']['count'], 1)  # keep-alive
+            self.assertEqual(summary['total']['count'], 5)
+            self.assertGreater(summary['delay']['max'], 0.01)
+            self.assertLessEqual(summary['ttfb']['p50'], summary['total']['max'])
+            self.assertEqual(len(events), 5)
+            self.assertEqual(events[2]['status_code'], 503)
+
+            fr.disable_metrics()
+            fr.get(url=server.url + '/a')
+            self.assertIsNone(fr.get_metrics_summary())
+
+    def test_histogram(self):
+        histogram = Histogram()
+        self.assertIsNone(histogram.summary()['p50'])
+        for value in [0.0005] * 90 + [0.1] * 9 + [5]:
+            histogram.add(value)
+        summary = histogram.summary()
+        self.assertEqual(summary['count'], 100)
+        self.assertEqual(summary['min'], 0.0005)
+        self.assertEqual(summary['max'], 5)
+        self.assertEqual(summary['p50'], 0.001)
+        self.assertLessEqual(summary['p99'], 0.128)
+        self.assertGreaterEqual(summary['p99'], 0.1)
+
+
+@unittest.skipIf(aiohttp is None, 'aiohttp is not installed')
+class AsyncFixedRequestsTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        # local stub server
+        self.hits = {}
+
+        async def flaky(request):
+            self.hits['flaky'] = self.hits.get('flaky', 0) + 1
+            if self.hits['flaky'] < 2:
+                return web.Response(status=503)
+            return web.Response(text='ok')
+
+        async def cookie(request):
+            response = web.Response(text=request.cookies.get('CAKE', ''))
+            response.set_cookie('CAKE', 'IS A LIE')
+            return response
+
+        app = web.Application()
+        app.router.add_get('/flaky', flaky)
+        app.router.add_get('/cookie', cookie)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f'http://127.0.0.1:{port}'
+
+    async def asyncTearDown(self):
+        await self.runner.cleanup()
+
+    async def test_retry(self):
+        async with AsyncFixedRequests() as fr:
+            fr.error_sleep_time = 0
+            with mock.patch.object(fr.rate_limiter, 'penalize'):  # skip backoff
+                r = await fr.get(url=self.base_url + '/flaky')
+            self.assertEqual(r.status, 200)
+            self.assertEqual(await r.text(), 'ok')
+            self.assertEqual(self.hits['flaky'], 2)
+
+            fr.max_errors = 1
+            self.hits['flaky'] = 0
+            with self.assertRaises(Exception):
+                await fr.get(url=self.base_url + '/flaky')
+
+    async def test_cookies(self):
+        async with AsyncFixedRequests() as fr:
+            r = await fr.get(url=self.base_url + '/cookie')
+            self.assertEqual(await r.text(), '')
+            self.assertEqual(fr.get_cookies(), {'CAKE': 'IS A LIE'})
+            r = await fr.get(url=self.base_url + '/cookie')
+            self.assertEqual(await r.text(), 'IS A LIE')
+
+        async with AsyncFixedRequests(use_cookies=False) as fr:
+            await fr.get(url=self.base_url + '/cookie')
+            self.assertEqual(fr.get_cookies(), {})
+
+    async def test_get_many(self):
+        async with AsyncFixedRequests() as fr:
+            responses = await fr.get_many([self.base_url + '/cookie'] * 20)
+            self.assertEqual([r.status for r in responses], [200] * 20)
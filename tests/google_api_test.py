@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+from unittest import mock
+import threading
+import time
+import json
+
+import sys, os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+# oauth2client and httplib2 are used only by authorize_credentials()
+for name in ['oauth2client', 'oauth2client.client', 'oauth2client.file', 'oauth2client.tools', 'httplib2']:
+    sys.modules.setdefault(name, mock.MagicMock())
+from google_api import GoogleAPI
+
+BATCH_RESPONSE = '\r\n'.join([
+    '--batch_abc',
+    'Content-Type: application/http',
+    'Content-ID: <response-item-1>',
+    '',
+    'HTTP/1.1 200 OK',
+    'Content-Type: application/json; charset=UTF-8',
+    '',
+    '{"id": "b"}',
+    '--batch_abc',
+    'Content-Type: application/http',
+    'Content-ID: <response-item-0>',
+    '',
+    'HTTP/1.1 404 Not Found',
+    'Content-Type: application/json; charset=UTF-8',
+    '',
+    '{"error": {"code": 404, "message": "Not Found"}}',
+    '--batch_abc',
+    'Content-Type: application/http',
+    'Content-ID: <response-item-2>',
+    '',
+    'HTTP/1.1 204 No Content',
+    '',
+    '',
+    '--batch_abc--',
+    '',
+])
+
+
+def mock_response(status_code=200, data=None, text=None, headers=None):
+    return mock.Mock(status_code=status_code, text=json.dumps(data) if text is None else text,
+                     headers=headers or {})
+
+
+def token_response(access_token):
+    return mock_response(data={'access_token': access_token, 'expires_in': 3600})
+
+
+class GoogleAPITest(unittest.TestCase):
+
+    def setUp(self):
+        with mock.patch('importlib.resources.path'):
+            self.api = GoogleAPI(client_secret='client_secret.json', credentials='credentials.json')
+        self.api.credentials_data = {'client_id': 'id', 'client_secret': 'secret', 'refresh_token': 'refresh'}
+        self.api.session = mock.Mock()
+
+    def test_access_token_refresh(self):
+        api = self.api
+
+        # near expiry, token is refreshed by one thread, others keep using the old one
+        api.access_token, api.access_token_expires = 'old', time.time() + api.TOKEN_REFRESH_MARGIN / 2
+        refreshing = threading.Event()
+
+        def post(*args, **kwargs):
+            refreshing.set()
+            time.sleep(0.2)
+            return token_response('new')
+
+        api.session.post.side_effect = post
+        results = []
+        refresh_thread = threading.Thread(target=lambda: results.append(api.get_access_token()))
+        refresh_thread.start()
+        refreshing.wait()
+        threads = [threading.Thread(target=lambda: results.append(api.get_access_token())) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads + [refresh_thread]:
+            thread.join()
+        self.assertEqual(api.session.post.call_count, 1)
+        self.assertEqual(sorted(results), ['new'] + ['old'] * 8)
+        self.assertEqual(api.get_access_token(), 'new')
+
+        # expired token is refreshed before use
+        api.access_token_expires = time.time() - 1
+        api.session.post.side_effect = None
+        api.session.post.return_value = token_response('newer')
+        self.assertEqual(api.get_access_token(), 'newer')
+        self.assertEqual(api.session.post.call_count, 2)
+
+    def test_unauthorized_retry(self):
+        api = self.api
+        api.session.post.side_effect = [token_response('t1'), token_response('t2')]
+        api.session.request.side_effect = [mock_response(401, {'error': 'unauthorized'}), mock_response(data={'a': 1})]
+        self.assertEqual(api.call('GET', 'https://www.googleapis.com/gmail/v1/users/me/profile'), {'a': 1})
+        self.assertEqual([x[1]['headers']['Authorization'] for x in api.session.request.call_args_list],
+                         ['OAuth t1', 'OAuth t2'])
+        self.assertEqual(api.session.post.call_count, 2)
+
+    def test_call_batch(self):
+        api = self.api
+        api.access_token, api.access_token_expires = 'token', time.time() + 3600
+        api.session.request.return_value = mock_response(
+            text=BATCH_RESPONSE, headers={'Content-Type': 'multipart/mixed; boundary=batch_abc'})
+        calls = [
+            {'verb': 'GET', 'url': 'https://www.googleapis.com/gmail/v1/users/me/messages/' + x}
+            for x in ['a', 'b', 'c']
+        ]
+
+        # responses are matched by Content-ID, not by order of parts
+        self.assertEqual(api.call_batch(calls), [
+            {'error': {'code': 404, 'message': 'Not Found'}},
+            {'id': 'b'},
+            {},
+        ])
+        args, kwargs = api.session.request.call_args
+        self.assertEqual(args, ('POST',))
+        self.assertEqual(kwargs['url'], 'https://www.googleapis.com/batch/gmail/v1')
+        body = kwargs['data'].decode('utf-8')
+        self.assertIn('Content-ID: <item-2>', body)
+        self.assertIn('GET /gmail/v1/users/me/messages/c?prettyPrint=false HTTP/1.1', body)
+
+        # batch request without multipart response
+        api.session.request.return_value = mock_response(500, {'error': 'failed'})
+        with self.assertRaises(Exception):
+            api.call_batch(calls)
+
+    def test_call_paginated(self):
+        api = self.api
+        api.access_token, api.access_token_expires = 'token', time.time() + 3600
+        api.session.request.side_effect = [
+            mock_response(data={'messages': [{'id': 1}, {'id': 2}], 'nextPageToken': 'p2'}),
+            mock_response(data={'messages': [{'id': 3}]}),
+        ]
+        url = 'https://www.googleapis.com/gmail/v1/users/me/messages'
+
+        # next page is requested only when previous one is consumed
+        items = api.call_paginated('GET', url, params={'q': 'x'}, items_key='messages')
+        self.assertEqual(next(items), {'id': 1})
+        self.assertEqual(api.session.request.call_count, 1)
+        self.assertEqual(list(items), [{'id': 2}, {'id': 3}])
+        self.assertEqual(api.session.request.call_count, 2)
+        self.assertEqual([x[1]['params'] for x in api.session.request.call_args_list], [
+            {'prettyPrint': 'false', 'q': 'x'},
+            {'prettyPrint': 'false', 'q': 'x', 'pageToken': 'p2'},
+        ])
+
+        # whole pages
+        api.session.request.side_effect = [mock_response(data={'messages': [{'id': 1}]})]
+        self.assertEqual(list(api.call_paginated('GET', url)), [{'messages': [{'id': 1}]}])
+
+    def test_rate_limit_backoff(self):
+        api = self.api
+        api.access_token, api.access_token_expires = 'token', time.time() + 3600
+        rate_limited = mock_response(403, {'error': {'code': 403, 'errors': [{'reason': 'rateLimitExceeded'}]}})
+        api.session.request.side_effect = [rate_limited, mock_response(data={'a': 1})]
+        with mock.patch('google_api.time.sleep') as sleep:
+            self.assertEqual(api.call_many([{'url': 'https://www.googleapis.com/a'}]), [{'a': 1}])
+            self.assertEqual(sleep.call_count, 1)
+            self.assertLessEqual(sleep.call_args[0][0], 2)
+
+            # gives up after max_retries, error is raised by call_paginated()
+            api.rate_limit_until = 0
+            api.session.request.side_effect = None
+            api.session.request.return_value = mock_response(429, {'error': {'code': 429}})
+            with self.assertRaises(Exception):
+                list(api.call_paginated('GET', 'https://www.googleapis.com/a', max_retries=3))
+        self.assertEqual(api.session.request.call_count, 2 + 4)
+        self.assertEqual(sleep.call_count, 1 + 3)
+        self.assertTrue(all(x[0][0] <= api.MAX_BACKOFF for x in sleep.call_args_list))
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import tempfile
+import hashlib
+import shutil
+import mmap
+import io
+from unittest import mock
+
+import sys, os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import hashing
+from hashing import get_sha1_hash, get_sha1_hash_from_stream, get_hashes, get_hashes_from_stream, \
+    get_hashes_from_buffer, hash_tree, get_tree_digest, HashCache
+from binarydatastream import BinaryDataStream
+
+DATA = bytes(range(256)) * 5000 + b'tail'
+ALGORITHMS = ['sha1', 'sha256', 'md5', 'blake2b']
+EXPECTED = {x: hashlib.new(x, DATA).hexdigest() for x in ALGORITHMS}
+
+
+class NoReadintoStream(object):
+
+    def __init__(self, data):
+        self.stream = io.BytesIO(data)
+
+    def seek(self, *args):
+        return self.stream.seek(*args)
+
+    def read(self, size=-1):
+        return self.stream.read(size)
+
+
+class HashingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.tmp_dir, 'file.bin')
+        with open(self.file_path, 'wb') as f:
+            f.write(DATA)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_file(self):
+        self.assertEqual(get_sha1_hash(self.file_path), EXPECTED['sha1'])
+        self.assertEqual(get_hashes(self.file_path, ALGORITHMS, buffer_size=1000), EXPECTED)
+
+    def test_streams(self):
+        f = open(self.file_path, 'rb')
+        self.addCleanup(f.close)
+        for stream in [f, io.BytesIO(DATA), BinaryDataStream(DATA), NoReadintoStream(DATA)]:
+            stream.seek(100)
+            self.assertEqual(get_sha1_hash_from_stream(stream), EXPECTED['sha1'])
+            self.assertEqual(get_hashes_from_stream(stream, ALGORITHMS, buffer_size=4096), EXPECTED)
+        stream = BinaryDataStream(DATA)
+        get_hashes_from_stream(stream)
+        stream.write(b'still writable')
+
+    def test_buffers(self):
+        self.assertEqual(get_hashes_from_buffer(DATA, ALGORITHMS, buffer_size=3000), EXPECTED)
+        self.assertEqual(get_hashes_from_buffer(b'', ['sha1'])['sha1'], hashlib.sha1().hexdigest())
+        with open(self.file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            self.assertEqual(get_hashes_from_buffer(mm, ALGORITHMS), EXPECTED)
+            self.assertEqual(get_hashes_from_stream(mm, ALGORITHMS), EXPECTED)
+
+    def test_hash_tree(self):
+        root = os.path.join(self.tmp_dir, 'tree')
+        files = {'a.txt': b'a', 'dir/b.txt': b'b', 'dir/sub/c.txt': b'c', 'other/c.txt': b'c'}
+        for path, data in files.items():
+            os.makedirs(os.path.dirname(os.path.join(root, path)), exist_ok=True)
+            with open(os.path.join(root, path), 'wb') as f:
+                f.write(data)
+        expected = {path: hashlib.sha1(data).hexdigest() for path, data in files.items()}
+        cache_path = os.path.join(self.tmp_dir, 'cache.json')
+
+        for use_processes in [False, True]:
+            hashes = hash_tree(root, workers=2, use_processes=use_processes)
+            self.assertEqual(hashes, expected)
+        self.assertEqual(hash_tree(root, cache=HashCache(cache_path)), expected)
+
+        # unchanged files are taken from persistent cache
+        with open(os.path.join(root, 'dir', 'b.txt'), 'wb') as f:
+            f.write(b'changed')
+        os.remove(os.path.join(root, 'a.txt'))
+        with mock.patch.object(hashing, '_hash_file', wraps=hashing._hash_file) as hash_file:
+            hashes = hash_tree(root, cache=HashCache(cache_path))
+        self.assertEqual([x[0][0] for x in hash_file.call_args_list], [os.path.join(root, 'dir', 'b.txt')])
+        self.assertEqual(hashes['dir/b.txt'], hashlib.sha1(b'changed').hexdigest())
+        self.assertEqual(len(HashCache(cache_path).entries), 3)
+
+        # tree digest doesn't depend on order and changes with content or structure
+        digest = get_tree_digest(expected)
+        self.assertEqual(get_tree_digest(dict(reversed(list(expected.items())))), digest)
+        self.assertNotEqual(get_tree_digest(dict(expected, **{'a.txt': expected['dir/b.txt']})), digest)
+        self.assertNotEqual(get_tree_digest({'dir/a.txt' if x == 'a.txt' else x: y for x, y in expected.items()}),
+                            digest)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+import unittest
+import tempfile
+import shutil
+
+import sys, os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from import_submodules import discover_submodules, import_submodules
+
+MODULE_SOURCE = 'from plugins_test_pkg import registry\nregistry.loaded.append(__name__)\nVALUE = __name__\n'
+PACKAGE_FILES = {
+    '__init__.py': '',
+    'registry.py': 'loaded = []\n',
+    'a.py': MODULE_SOURCE,
+    'sub/__init__.py': MODULE_SOURCE,
+    'sub/b.py': MODULE_SOURCE,
+    'sub/deep/__init__.py': '',
+    'sub/deep/c.py': MODULE_SOURCE,
+}
+
+
+class ImportSubmodulesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        for path, source in PACKAGE_FILES.items():
+            path = os.path.join(self.tmp_dir, 'plugins_test_pkg', path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                f.write(source)
+        sys.path.insert(0, self.tmp_dir)
+
+    def tearDown(self):
+        sys.path.remove(self.tmp_dir)
+        for name in [x for x in sys.modules if x.startswith('plugins_test_pkg')]:
+            del sys.modules[name]
+        shutil.rmtree(self.tmp_dir)
+
+    def test_discover(self):
+        names = discover_submodules('plugins_test_pkg')
+        self.assertEqual(sorted(names), [
+            'plugins_test_pkg.a', 'plugins_test_pkg.registry', 'plugins_test_pkg.sub', 'plugins_test_pkg.sub.b',
+            'plugins_test_pkg.sub.deep', 'plugins_test_pkg.sub.deep.c',
+        ])
+        self.assertLess(names.index('plugins_test_pkg.sub'), names.index('plugins_test_pkg.sub.b'))
+        self.assertEqual(sorted(discover_submodules('plugins_test_pkg', recursive=False)), [
+            'plugins_test_pkg.a', 'plugins_test_pkg.registry', 'plugins_test_pkg.sub',
+        ])
+        self.assertNotIn('plugins_test_pkg.a', sys.modules)
+
+    def test_import(self):
+        timings = {}
+        modules = import_submodules('plugins_test_pkg', timings=timings)
+        self.assertEqual(set(modules), set(discover_submodules('plugins_test_pkg')))
+        self.assertEqual(modules['plugins_test_pkg.sub.deep.c'].VALUE, 'plugins_test_pkg.sub.deep.c')
+        registry = modules['plugins_test_pkg.registry']
+        self.assertEqual(len(registry.loaded), len(set(registry.loaded)))  # every module imported once
+        self.assertEqual(set(timings), set(modules))
+
+    def test_import_lazy(self):
+        modules = import_submodules('plugins_test_pkg', lazy=True)
+        registry = sys.modules['plugins_test_pkg.registry']
+        self.assertNotIn('plugins_test_pkg.a', registry.loaded)
+        self.assertNotIn('plugins_test_pkg.sub.deep.c', registry.loaded)
+        self.assertNotIn('plugins_test_pkg.sub', registry.loaded)  # lazy parent isn't loaded by its submodules
+        self.assertEqual(modules['plugins_test_pkg.a'].VALUE, 'plugins_test_pkg.a')
+        self.assertIn('plugins_test_pkg.a', registry.loaded)
+        import plugins_test_pkg.sub.deep
+        self.assertIs(plugins_test_pkg.sub.deep.c, modules['plugins_test_pkg.sub.deep.c'])
+        self.assertEqual(plugins_test_pkg.sub.deep.c.VALUE, 'plugins_test_pkg.sub.deep.c')
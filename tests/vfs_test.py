@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import importlib
+import tempfile
+import shutil
+import gc
+
+import sys, os
+# vfs uses relative imports of modules from package directory, so it's imported as subpackage of it
+package_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.dirname(package_dir))
+package_name = os.path.basename(package_dir)
+BinaryDataStream = importlib.import_module(package_name + '.binarydatastream').BinaryDataStream
+BlobStore = importlib.import_module(package_name + '.vfs.blob_store').BlobStore
+StorageMemory = importlib.import_module(package_name + '.vfs.storage_memory').StorageMemory
+VirtualFileSystem = importlib.import_module(package_name + '.vfs.vfs').VirtualFileSystem
+
+
+class BlobStoreTest(unittest.TestCase):
+
+    def test_storage_memory(self):
+        blob_store = BlobStore()
+        storage1 = StorageMemory(blob_store=blob_store)
+        storage2 = StorageMemory(blob_store=blob_store)
+
+        # identical files of different storages are stored once
+        data = BinaryDataStream(b'same content')
+        data.seek(5)
+        storage1.set('a.txt', data)
+        self.assertEqual(data.tell(), 5)
+        storage2.set('dir/b.txt', BinaryDataStream(b'same content'))
+        self.assertEqual(storage2.get('dir/b.txt').read(), b'same content')
+        self.assertEqual(blob_store.get_stats(), {
+            'blobs': 1, 'references': 2, 'stored_bytes': 12, 'deduplicated_bytes': 12,
+        })
+
+        # overwrite and delete release old content
+        storage1.set('a.txt', BinaryDataStream(b'other'))
+        self.assertEqual(storage1.get('a.txt').read(), b'other')
+        self.assertEqual(blob_store.get_stats()['references'], 2)
+        self.assertEqual(blob_store.get_stats()['blobs'], 2)
+        storage1.delete('a.txt')
+        self.assertFalse(storage1.exists('a.txt'))
+        self.assertEqual(blob_store.get_stats()['blobs'], 1)
+        with self.assertRaises(FileNotFoundError):
+            storage1.delete('a.txt')
+
+        # garbage collected storage releases its content
+        del storage2
+        gc.collect()
+        self.assertEqual(blob_store.get_stats()['blobs'], 0)
+        self.assertEqual(blob_store.get_stats()['references'], 0)
+
+
+class VirtualFileSystemTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        for name in ['a.txt', 'b.txt', 'c.txt']:
+            with open(os.path.join(self.tmp_dir, name), 'wb') as f:
+                f.write(name.encode())
+        self.blob_store = BlobStore()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def get_cached_paths(self, vfs):
+        return [x.storage_path for x in vfs.cache]
+
+    def test_cache(self):
+        vfs = VirtualFileSystem(cache_size=2, blob_store=self.blob_store)
+        vfs.load_storage_uri('file://' + self.tmp_dir)
+        vfs.build_index()
+
+        # least recently used file is evicted
+        for path in ['a.txt', 'b.txt', 'A.TXT', 'c.txt']:
+            data, file_type = vfs.get(path)
+            self.assertEqual(data.read(), path.lower().encode())
+            self.assertEqual(file_type, 'txt')
+        self.assertEqual(self.get_cached_paths(vfs), ['a.txt', 'c.txt'])
+        self.assertEqual(self.blob_store.get_stats()['references'], 2)
+
+        # cached content is returned without reading storage
+        with open(os.path.join(self.tmp_dir, 'a.txt'), 'wb') as f:
+            f.write(b'changed')
+        self.assertEqual(vfs.get('a.txt')[0].read(), b'a.txt')
+        self.assertEqual(self.get_cached_paths(vfs), ['c.txt', 'a.txt'])
+
+        # removed storage releases its cached files
+        storage = next(iter(vfs.storage_list))
+        vfs.remove_storage(storage)
+        self.assertEqual(self.get_cached_paths(vfs), [])
+        self.assertEqual(self.blob_store.get_stats()['blobs'], 0)
+
+        vfs.add_storage(storage)
+        vfs.get('b.txt')
+        vfs.clear_cache()
+        self.assertEqual(self.blob_store.get_stats()['blobs'], 0)
+
+    def test_cache_memory_storage(self):
+        vfs = VirtualFileSystem(cache_size=2, blob_store=self.blob_store)
+        storage = StorageMemory(blob_store=self.blob_store)
+        storage.set('d.txt', BinaryDataStream(b'd'))
+        vfs.add_storage(storage)
+        vfs.build_index()
+
+        # memory storage content is already in blob store, it isn't cached
+        self.assertEqual(vfs.get('d.txt')[0].read(), b'd')
+        self.assertEqual(self.get_cached_paths(vfs), [])
+        self.assertEqual(self.blob_store.get_stats()['references'], 1)
@@ -0,0 +1,72 @@
+#!/usr/bin/python3
+# coding: utf-8
+
+import logging
+import threading
+from typing import Iterable
+
+from ..hashing import get_hashes_from_buffer
+
+_logger = logging.getLogger(__name__)
+
+
+class BlobStore(object):
+    """
+    Content-addressed storage of file contents. Blobs are keyed by digest of their content,
+    so identical files put by different storages (or VFS cache) are kept in memory only once.
+    Every put() adds one reference to blob, blob is removed when all references are released.
+    """
+
+    def __init__(self, algorithm: str = 'sha1'):
+        self.algorithm = algorithm
+        self.blobs = {}  # digest: bytes
+        self.refcounts = {}  # digest: number of references
+        self.lock = threading.Lock()
+        self.deduplicated_bytes = 0  # size of data that didn't have to be stored
+
+    def put(self, data: bytes) -> str:
+        """
+        :param data: file content
+        :return: digest of content, used as key of blob
+        """
+        data = bytes(data)
+        digest = get_hashes_from_buffer(data, [self.algorithm])[self.algorithm]
+        with self.lock:
+            if digest in self.blobs:
+                self.deduplicated_bytes += len(data)
+                self.refcounts[digest] += 1
+            else:
+                self.blobs[digest] = data
+                self.refcounts[digest] = 1
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        return self.blobs[digest]
+
+    def release(self, digest: str) -> None:
+        """ Removes one reference to blob """
+        with self.lock:
+            self.refcounts[digest] -= 1
+            if self.refcounts[digest] <= 0:
+                del self.refcounts[digest]
+                del self.blobs[digest]
+
+    def release_all(self, digests: Iterable[str]) -> None:
+        for digest in list(digests):
+            self.release(digest)
+
+    def get_memory_usage(self) -> int:
+        return sum(len(x) for x in self.blobs.values())
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {
+                'blobs': len(self.blobs),
+                'references': sum(self.refcounts.values()),
+                'stored_bytes': sum(len(x) for x in self.blobs.values()),
+                'deduplicated_bytes': self.deduplicated_bytes,
+            }
+
+
+# shared by all storages and VFS caches that don't use their own store
+DEFAULT_BLOB_STORE = BlobStore()
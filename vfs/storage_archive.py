@@ -14,19 +14,30 @@ _logger = logging.getLogger(__name__)
 
 
 class StorageArchive(StorageInterface):
+    """
+    Nested archives (archives inside of archives) use URI of outer archive followed by paths inside of archives,
+    separated by '!/'. Example: 'file:///packs/outer.zip!/inner/pack.zip'
+    """
 
     def __init__(self, *args, **kwargs):
         self.fs_path = None
         self.decompressor = Decompressor()
+        self.outer_decompressors = []  # archives containing nested archive, from outermost
         super().__init__(*args, **kwargs)
 
     @classmethod
     def validate_uri(cls, uri: str) -> bool:
-        path = vfs_utils.convert_uri_to_fs_path(uri)
+        outer_uri, nested_paths = vfs_utils.split_nested_archive_uri(uri)
+        path = vfs_utils.convert_uri_to_fs_path(outer_uri)
         if not (path and os.path.isfile(path) and os.path.exists(path)):
             return False
-        file_type = vfs_utils.parse_file_type(os.path.basename(path))
-        return file_type in [x.lower() for x in Decompressor().EXTENSIONS]
+        if not Decompressor.is_supported(path):
+            return False
+        # nested archives are validated only by extension, detecting them from content would require opening
+        return all(
+            Decompressor.get_archiver_by_extension(vfs_utils.parse_file_type(os.path.basename(x))) is not None
+            for x in nested_paths
+        )
 
     def build_index(self) -> None:
         # validate path
@@ -34,16 +45,27 @@ class StorageArchive(StorageInterface):
             raise NotADirectoryError(self.uri)
         # build index
         self.index = {}
-        self.fs_path = vfs_utils.convert_uri_to_fs_path(self.uri)
-        self.decompressor.close()
+        outer_uri, nested_paths = vfs_utils.split_nested_archive_uri(self.uri)
+        self.fs_path = vfs_utils.convert_uri_to_fs_path(outer_uri)
+        self.close_archives()
         self.decompressor.open(self.fs_path)
+        for nested_path in nested_paths:
+            self.outer_decompressors.append(self.decompressor)
+            self.decompressor = self.decompressor.open_nested(nested_path)
         for file_path in self.decompressor.get_file_list():
             file_type = vfs_utils.parse_file_type(os.path.basename(file_path))
             self.index[file_path] = StorageIndexItem(file_type=file_type)
 
+    def close_archives(self) -> None:
+        """ Closes opened archive and all archives containing it """
+        self.decompressor.close()
+        while self.outer_decompressors:
+            self.decompressor = self.outer_decompressors.pop()
+            self.decompressor.close()
+
     # Files
 
     def get(self, path: str) -> BinaryDataStream:
         if not self.exists(path):
             raise FileNotFoundError(path)
-        return BinaryDataStream(self.decompressor.open_file(path))
+        return BinaryDataStream(self.decompressor.open_file(path).getvalue())
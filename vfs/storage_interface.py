@@ -27,8 +27,11 @@ class StorageInterface(object):
     Attributes:
         uri         str; Uniform Resource Identifier (https://en.wikipedia.org/wiki/Uniform_Resource_Identifier)
         index       dict; {path: IndexItem(type=resource_type), path: IndexItem(type=resource_type), ...}
+        CACHEABLE   bool; False, if VFS content cache shouldn't keep files of this storage
     """
 
+    CACHEABLE = True
+
     def __init__(self, uri: Union[str, None] = None):
         """
         :param uri: Uniform Resource Identifier
@@ -5,28 +5,45 @@ import logging
 from typing import Union
 import os
 import io
+import pickle
+import weakref
 
 from ..binarydatastream import BinaryDataStream
 
 from .storage_interface import StorageInterface, StorageIndexItem
+from .blob_store import BlobStore, DEFAULT_BLOB_STORE
 from . import vfs_utils
 
 _logger = logging.getLogger(__name__)
 
 
 class StorageMemory(StorageInterface):
+    """
+    File contents are kept in BlobStore (shared DEFAULT_BLOB_STORE by default),
+    so identical files are stored only once across all memory storages and VFS caches.
+    """
 
-    def __init__(self, *args, **kwargs):
-        self.binary_data = {}
-        super().__init__(*args, **kwargs)
+    # content is already in blob store, VFS cache would only add references to the same blobs
+    CACHEABLE = False
+
+    def __init__(self, uri: Union[str, None] = None, blob_store: Union[BlobStore, None] = None):
+        self.blob_store = blob_store if blob_store is not None else DEFAULT_BLOB_STORE
+        self.digests = {}  # path: digest of content in blob store
+        # release blobs when storage is garbage collected
+        weakref.finalize(self, self.blob_store.release_all, self.digests.values())
+        super().__init__(uri)
 
     @classmethod
     def validate_uri(cls, uri: Union[str, None]) -> bool:
         return uri is None
 
+    def get_memory_usage(self):
+        # content is shared in blob store, see VirtualFileSystem.get_memory_usage()
+        return len(pickle.dumps(self.index)) + len(pickle.dumps(self.digests))
+
     def build_index(self) -> None:
         self.index = {}
-        for path in self.binary_data:
+        for path in self.digests:
             file_type = vfs_utils.parse_file_type(os.path.basename(path))
             self.index[path] = StorageIndexItem(file_type=file_type)
 
@@ -35,13 +52,16 @@ class StorageMemory(StorageInterface):
     def get(self, path: str) -> BinaryDataStream:
         if not self.exists(path):
             raise FileNotFoundError(path)
-        return BinaryDataStream(self.binary_data[path])
+        return BinaryDataStream(self.blob_store.get(self.digests[path]))
 
     def set(self, path: str, data: BinaryDataStream) -> None:
-        last_pos = self.tell()  # remember last position
+        last_pos = data.tell()  # remember last position
         data.seek(0x0, io.SEEK_SET)  # move to start of stream
-        self.binary_data[path] = data.read()  # save bytes
+        digest = self.blob_store.put(data.read())  # save bytes
         data.seek(last_pos, io.SEEK_SET)  # move back to last position
+        if path in self.digests:
+            self.blob_store.release(self.digests[path])
+        self.digests[path] = digest
         # update index
         file_type = vfs_utils.parse_file_type(os.path.basename(path))
         self.index[path] = StorageIndexItem(file_type=file_type)
@@ -49,6 +69,6 @@ class StorageMemory(StorageInterface):
     def delete(self, path: str) -> None:
         if not self.exists(path):
             raise FileNotFoundError(path)
-        del(self.binary_data[path])
+        self.blob_store.release(self.digests.pop(path))
         # update index
         del(self.index[path])
@@ -14,6 +14,7 @@ from .storage_interface import StorageInterface
 from .storage_memory import StorageMemory
 from .storage_directory import StorageDirectory
 from .storage_archive import StorageArchive
+from .blob_store import BlobStore, DEFAULT_BLOB_STORE
 from . import vfs_utils
 
 _logger = logging.getLogger(__name__)
@@ -25,10 +26,18 @@ class VirtualFileSystem(object):
 
     STORAGE_CLASSES = {StorageMemory, StorageDirectory, StorageArchive}
 
-    def __init__(self, case_sensitive=False):
+    def __init__(self, case_sensitive=False, cache_size=0, blob_store: Union[BlobStore, None] = None):
+        """
+        :param cache_size: max number of files kept in content cache, 0 disables cache
+        :param blob_store: content-addressed store of cached files, identical files are cached only once
+                           and share memory with StorageMemory objects using the same store
+        """
         self.case_sensitive = case_sensitive
         self.storage_list = set()
         self.index = {} if self.case_sensitive else CaseInsensitiveDict()
+        self.cache_size = cache_size
+        self.blob_store = blob_store if blob_store is not None else DEFAULT_BLOB_STORE
+        self.cache = OrderedDict()  # VFSIndexItem: digest of content in blob store, from oldest to newest used
 
     # storage
 
@@ -44,6 +53,8 @@ class VirtualFileSystem(object):
     def remove_storage(self, storage_object: StorageInterface) -> None:
         if storage_object in self.storage_list:
             self.storage_list.remove(storage_object)
+        for index_item in [x for x in self.cache if x.storage is storage_object]:
+            self.blob_store.release(self.cache.pop(index_item))
 
     def load_storage_uri(self, uri: str) -> None:
         _logger.info(f'Loading VFS storage URI: {uri}')
@@ -152,10 +163,32 @@ class VirtualFileSystem(object):
         if found:
             common_path, _ = self.parse_path(path)
             index_item = self.index[common_path][file_type]
-            return index_item.storage.get(index_item.storage_path), file_type
+            return self._get_file(index_item), file_type
         else:
             raise FileNotFoundError(path)
 
+    # cache
+
+    def _get_file(self, index_item: VFSIndexItem) -> BinaryDataStream:
+        if self.cache_size <= 0 or not index_item.storage.CACHEABLE:
+            return index_item.storage.get(index_item.storage_path)
+        digest = self.cache.get(index_item)
+        if digest is not None:
+            self.cache.move_to_end(index_item)
+            return BinaryDataStream(self.blob_store.get(digest))
+        digest = self.blob_store.put(index_item.storage.get(index_item.storage_path).getvalue())
+        self.cache[index_item] = digest
+        while len(self.cache) > self.cache_size:
+            _, old_digest = self.cache.popitem(last=False)
+            self.blob_store.release(old_digest)
+        # returned stream shares memory with cached blob
+        return BinaryDataStream(self.blob_store.get(digest))
+
+    def clear_cache(self) -> None:
+        while self.cache:
+            _, digest = self.cache.popitem()
+            self.blob_store.release(digest)
+
     # Debugging
 
     def dump_structure(self, quiet=True, tofile=True):
@@ -192,6 +225,15 @@ class VirtualFileSystem(object):
             else:
                 _logger.info(f'[VFS-MEM] Storage {i}: {storage}: {usage} bytes')
 
+        # blob stores are shared, count each one only once
+        blob_stores = {id(x): x for x in [getattr(x, 'blob_store', None) for x in self.storage_list] if x is not None}
+        if self.cache:
+            blob_stores[id(self.blob_store)] = self.blob_store
+        for blob_store in blob_stores.values():
+            usage = blob_store.get_memory_usage()
+            sum_usage += usage
+            _logger.info(f'[VFS-MEM] Blob store: {usage} bytes')
+
         # index memory usage
         usage_index = len(pickle.dumps(self.index))
         sum_usage += usage_index
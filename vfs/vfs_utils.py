@@ -3,7 +3,10 @@
 
 import os
 import urllib.parse
-from typing import Union
+from typing import Union, Tuple, List
+
+# separates path of archive from path of nested archive inside of it, e.g. 'file:///packs/a.zip!/inner/b.zip'
+NESTED_ARCHIVE_SEPARATOR = '!/'
 
 
 def parse_uri(uri: Union[str, None], unquote: bool = False) -> dict:
@@ -43,6 +46,17 @@ def convert_uri_to_fs_path(uri: Union[str, None]) -> Union[str, None]:
     return path
 
 
+def split_nested_archive_uri(uri: Union[str, None]) -> Tuple[Union[str, None], List[str]]:
+    """
+    'file:///a.zip!/b/c.zip!/d.zip' => ('file:///a.zip', ['b/c.zip', 'd.zip'])
+    :return: tuple(uri of outermost archive, list of paths of nested archives)
+    """
+    if uri is None:
+        return None, []
+    parts = uri.split(NESTED_ARCHIVE_SEPARATOR)
+    return parts[0], [urllib.parse.unquote(x) for x in parts[1:]]
+
+
 def parse_file_type(file_name):
     """
     :return: Lowercase extension or None